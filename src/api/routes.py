@@ -1,51 +1,253 @@
 import uuid
-import shutil
-from fastapi import APIRouter, UploadFile, File, Form, HTTPException, BackgroundTasks
-from src.api.schemas import RankingResponse
+import asyncio
+from typing import List, Optional
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Request, Response
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from src.api.schemas import (
+    RankingResponse, BatchRankingResponse, CorpusStats, CorpusIngestResponse,
+    JobSubmitResponse, JobStatusResponse, HealthResponse, ReadinessResponse, ComponentStatus
+)
 from src.modules.ingestion import ingestion_service
-from src.modules.vision import vision_engine
 from src.modules.rag import rag_engine
-from src.modules.analysis import llm_ranker
+from src.modules.corpus import corpus_manager
+from src.modules.pipeline import ranking_pipeline
+from src.modules.jobs import job_manager
+from src.modules.events import JobEventStream
+from src.core.config import settings
+from src.core.lifecycle import components, uptime_seconds, warmup_finished
+from src.core import metrics
 from src.core.logger import app_logger
 
 router = APIRouter()
 
+@router.get("/health", response_model=HealthResponse)
+async def health():
+    """
+    Liveness: the process is up and serving requests.
+    """
+    return HealthResponse(uptime_seconds=uptime_seconds())
+
+@router.get("/ready", response_model=ReadinessResponse)
+async def ready(response: Response):
+    """
+    Readiness: 503 until the startup warmup has loaded every model, with
+    per-component load and warmup times. Without MODEL_WARMUP models load on
+    first use, so the service reports ready straight away.
+    """
+    statuses = [component.status() for component in components()]
+    is_ready = not settings.MODEL_WARMUP or (
+        warmup_finished() and all(status["state"] == "ready" for status in statuses)
+    )
+    if not is_ready:
+        response.status_code = 503
+    return ReadinessResponse(
+        ready=is_ready,
+        uptime_seconds=uptime_seconds(),
+        components=[ComponentStatus(**status) for status in statuses]
+    )
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """
+    Prometheus text exposition: per-step and per-stage latency histograms, job
+    and queue times, LLM token counters.
+    """
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+async def _submit_upload_job(file: UploadFile, preview: str, run, label: str = "JD Preview") -> dict:
+    """
+    Validates the upload and queues `run(job_id, upload, on_stage)` as a job.
+    """
+    job_manager.admit()
+    # The job task inherits this context, so ingestion counts toward the job's timings.
+    metrics.start_job()
+
+    job_id = str(uuid.uuid4())
+    app_logger.info(f"Starting Job {job_id} | {label}: {preview[:50]}...")
+
+    upload = await ingestion_service.ingest(file)
+    try:
+        return job_manager.submit(job_id, lambda on_stage: run(job_id, upload, on_stage))
+    except HTTPException:
+        upload.cleanup()
+        raise
+
+async def _submit_ranking(file: UploadFile, job_description: str, top_k: int) -> dict:
+    return await _submit_upload_job(
+        file,
+        job_description,
+        lambda job_id, upload, on_stage: ranking_pipeline.run(
+            job_id, upload, job_description, top_k, on_stage=on_stage
+        )
+    )
+
 @router.post("/rank", response_model=RankingResponse)
 async def rank_resumes(
-    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     job_description: str = Form(...),
     top_k: int = Form(5)
 ):
-    job_id = str(uuid.uuid4())
-    app_logger.info(f"Starting Job {job_id} | JD Preview: {job_description[:50]}...")
+    job = await _submit_ranking(file, job_description, top_k)
+    return await job_manager.wait(job)
 
-    extract_path = await ingestion_service.process_zip(file)
-    
-    ocr_results = vision_engine.process_directory(extract_path)
-    
-    if not ocr_results:
-        shutil.rmtree(extract_path.parent)
-        raise HTTPException(status_code=400, detail="No readable text found in the uploaded resumes")
+@router.post("/rank/stream")
+async def rank_resumes_stream(
+    request: Request,
+    file: UploadFile = File(...),
+    job_description: str = Form(...),
+    top_k: int = Form(5)
+):
+    """
+    Same as /rank, but streams the job as it runs: NDJSON by default, Server-Sent
+    Events with `Accept: text/event-stream`. Events are `job`, `stage`, `candidate`
+    (an unranked Stage-1 profile, as soon as it is extracted), `heartbeat`, and
+    finally `result` (the judged ranking) or `error`.
+    """
+    events = JobEventStream(sse="text/event-stream" in request.headers.get("accept", ""))
+    job = await _submit_upload_job(
+        file,
+        job_description,
+        lambda job_id, upload, on_stage: ranking_pipeline.run(
+            job_id, upload, job_description, top_k,
+            on_stage=events.forward(on_stage),
+            on_candidate=events.candidate
+        )
+    )
+    return StreamingResponse(
+        events.stream(job, status_url=str(request.url_for("get_ranking_job", job_id=job["job_id"]))),
+        media_type=events.media_type,
+        # Proxies must pass events through as they come instead of buffering the body.
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
-    app_logger.info(f"Job {job_id}: Successfully OCR'd {len(ocr_results)} documents.")
+@router.post("/rank/jobs", response_model=JobSubmitResponse, status_code=202)
+async def submit_ranking_job(
+    request: Request,
+    file: UploadFile = File(...),
+    job_description: str = Form(...),
+    top_k: int = Form(5)
+):
+    """
+    Same as /rank but returns immediately; poll `status_url` for progress and the result.
+    """
+    job = await _submit_ranking(file, job_description, top_k)
+    return JobSubmitResponse(
+        job_id=job["job_id"],
+        status=job["status"],
+        status_url=str(request.url_for("get_ranking_job", job_id=job["job_id"]))
+    )
 
-    full_text_map = {item['filename']: item['text'] for item in ocr_results}
+@router.post("/rank/batch", response_model=BatchRankingResponse)
+async def rank_resumes_batch(
+    file: UploadFile = File(...),
+    job_descriptions: List[str] = Form(...),
+    top_k: int = Form(5)
+):
+    """
+    Ranks one zip against several job descriptions (repeat the `job_descriptions` field),
+    paying for OCR and indexing once.
+    """
+    job_descriptions = [jd for jd in job_descriptions if jd.strip()]
+    if not job_descriptions:
+        raise HTTPException(status_code=400, detail="At least one job description is required")
+    if len(job_descriptions) > settings.MAX_BATCH_JOB_DESCRIPTIONS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.MAX_BATCH_JOB_DESCRIPTIONS} job descriptions per batch"
+        )
 
-    index, chunk_metadata = rag_engine.create_index(ocr_results)
-    
-    relevant_chunks = rag_engine.search(index, chunk_metadata, query=job_description, k=top_k * 5)
-    
+    job = await _submit_upload_job(
+        file,
+        " | ".join(job_descriptions),
+        lambda job_id, upload, on_stage: ranking_pipeline.run_batch(
+            job_id, upload, job_descriptions, top_k, on_stage=on_stage
+        )
+    )
+    return await job_manager.wait(job)
+
+@router.get("/rank/jobs/{job_id}", response_model=JobStatusResponse)
+async def get_ranking_job(job_id: str):
+    job = job_manager.get(job_id)
+    return JobStatusResponse(**{key: value for key, value in job.items() if key in JobStatusResponse.model_fields})
 
-    final_results = await llm_ranker.rank_candidates(
-        job_description, 
-        relevant_chunks, 
-        full_docs_map=full_text_map
+async def _open_corpus(corpus_name: str, index_type: Optional[str] = None, create: bool = False):
+    # The embedding dimension may load the embedder (or wait for the warmup
+    # that is loading it), and opening a corpus reads its files: both stay off the event loop.
+    return await asyncio.to_thread(
+        lambda: corpus_manager.get(corpus_name, rag_engine.dimension, index_type=index_type, create=create)
     )
 
-    background_tasks.add_task(shutil.rmtree, extract_path.parent)
+@router.post("/corpus/{corpus_name}/documents", response_model=CorpusIngestResponse)
+async def add_corpus_documents(
+    corpus_name: str,
+    file: UploadFile = File(...),
+    index_type: Optional[str] = Form(None)
+):
+    """
+    Adds (or replaces, by filename) resumes in a persistent corpus, creating it on first use.
+    `index_type` (flat, ivf, hnsw) only applies when the corpus is created.
+    Runs as a job, so it shares the JOB_WORKERS slots and queue limit with /rank.
+    """
+    corpus_manager.validate(corpus_name, index_type)
+
+    async def run(job_id: str, upload, on_stage) -> CorpusIngestResponse:
+        try:
+            ocr_results = await ranking_pipeline.ocr(upload, on_stage)
+        finally:
+            upload.cleanup()
+
+        on_stage("indexing", "running")
+        embeddings, chunk_metadata = await asyncio.to_thread(rag_engine.embed_documents, ocr_results)
+        # Created only now, so a rejected or unreadable upload leaves no empty corpus behind.
+        corpus = await _open_corpus(corpus_name, index_type=index_type, create=True)
+        added = await asyncio.to_thread(corpus.add_documents, ocr_results, embeddings, chunk_metadata)
+        on_stage("indexing", "done", chunks=len(chunk_metadata))
+
+        return CorpusIngestResponse(added=added, **corpus.stats())
+
+    job = await _submit_upload_job(file, corpus_name, run, label="Corpus")
+    return await job_manager.wait(job)
+
+@router.get("/corpus/{corpus_name}", response_model=CorpusStats)
+async def get_corpus(corpus_name: str):
+    corpus = await _open_corpus(corpus_name)
+    return CorpusStats(**corpus.stats())
+
+@router.delete("/corpus/{corpus_name}/documents/{doc_id}", response_model=CorpusStats)
+async def remove_corpus_document(corpus_name: str, doc_id: str):
+    corpus = await _open_corpus(corpus_name)
+    if not await asyncio.to_thread(corpus.remove_document, doc_id):
+        raise HTTPException(status_code=404, detail=f"Document '{doc_id}' not found")
+    return CorpusStats(**corpus.stats())
+
+@router.post("/corpus/{corpus_name}/rank", response_model=RankingResponse)
+async def rank_corpus(
+    corpus_name: str,
+    job_description: str = Form(...),
+    top_k: int = Form(5)
+):
+    """
+    Ranks an existing corpus against a new job description without re-ingesting it.
+    Runs as a job, like /rank.
+    """
+    corpus = await _open_corpus(corpus_name)
+    job_manager.admit()
+    metrics.start_job()
+
+    job_id = str(uuid.uuid4())
+    app_logger.info(f"Starting Job {job_id} on corpus {corpus_name} | JD Preview: {job_description[:50]}...")
+
+    async def run(on_stage) -> RankingResponse:
+        on_stage("retrieval", "running")
+        query_vec = await asyncio.to_thread(rag_engine.embed_query, job_description)
+        relevant_chunks = await asyncio.to_thread(corpus.search, query_vec, top_k * 5)
+        if not relevant_chunks:
+            raise HTTPException(status_code=400, detail="Corpus is empty")
+        on_stage("retrieval", "done", chunks=len(relevant_chunks))
+
+        filenames = list({item['chunk']['filename'] for item in relevant_chunks})
+        full_text_map = await asyncio.to_thread(corpus.full_text_map, filenames)
+
+        return await ranking_pipeline.rank(job_id, job_description, relevant_chunks, full_text_map, top_k, on_stage)
 
-    return RankingResponse(
-        job_id=job_id,
-        candidates=final_results[:top_k]
-    )
\ No newline at end of file
+    return await job_manager.wait(job_manager.submit(job_id, run))
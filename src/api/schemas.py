@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import List, Optional
+from typing import Any, Dict, List, Optional, Union
 
 class JobDescription(BaseModel):
     title: str = Field(..., description="Job Title, e.g. 'Backend Engineer'")
@@ -14,6 +14,74 @@ class CandidateResult(BaseModel):
     extracted_skills: List[str]
     relevant_experience: List[str]
 
+class SkippedCandidate(BaseModel):
+    filename: str
+    prefilter_score: float = Field(..., description="Pooled dense (embedding) similarity that fell below the Stage-0 cut")
+
+class SpanTiming(BaseModel):
+    calls: int
+    seconds: float
+
+class JobTimings(BaseModel):
+    wall_seconds: float = Field(..., description="From submission to completion, including time queued")
+    stages: Dict[str, float] = Field({}, description="Seconds per pipeline stage")
+    spans: Dict[str, SpanTiming] = Field({}, description="Summed time per instrumented step; steps on parallel threads overlap")
+    tokens: Dict[str, int] = Field({}, description="LLM prompt, cached_prompt and generated tokens")
+
 class RankingResponse(BaseModel):
     job_id: str
-    candidates: List[CandidateResult]
\ No newline at end of file
+    candidates: List[CandidateResult]
+    skipped: List[SkippedCandidate] = Field([], description="Retrieved documents the prefilter kept out of the LLM stages")
+    timings: Optional[JobTimings] = Field(None, description="Per-job breakdown, with JOB_TIMINGS on")
+
+class BatchRankingResponse(BaseModel):
+    job_id: str
+    results: List[RankingResponse] = Field(..., description="One ranking per job description, in request order")
+    timings: Optional[JobTimings] = Field(None, description="Per-job breakdown for the whole batch, with JOB_TIMINGS on")
+
+class CorpusStats(BaseModel):
+    corpus: str
+    index_type: str
+    documents: int
+    chunks: int
+    vectors: int = Field(..., description="Vectors in the FAISS index (HNSW keeps removed ones until rebuilt)")
+
+class CorpusIngestResponse(CorpusStats):
+    added: List[str]
+    timings: Optional[JobTimings] = Field(None, description="Per-job breakdown, with JOB_TIMINGS on")
+
+class StageProgress(BaseModel):
+    status: str = Field(..., description="pending | running | done | skipped")
+    detail: Dict[str, Any] = {}
+
+class JobSubmitResponse(BaseModel):
+    job_id: str
+    status: str
+    status_url: str
+
+class JobStatusResponse(BaseModel):
+    job_id: str
+    status: str = Field(..., description="queued | running | completed | failed")
+    stage: Optional[str] = Field(None, description="Most recently reported pipeline stage")
+    stages: Dict[str, StageProgress]
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    error: Optional[str] = None
+    result: Optional[Union[RankingResponse, BatchRankingResponse, CorpusIngestResponse]] = None
+
+class HealthResponse(BaseModel):
+    status: str = "ok"
+    uptime_seconds: float
+
+class ComponentStatus(BaseModel):
+    name: str
+    state: str = Field(..., description="pending, loading, ready or failed")
+    load_seconds: Optional[float] = None
+    warmup_seconds: Optional[float] = None
+    error: Optional[str] = None
+
+class ReadinessResponse(BaseModel):
+    ready: bool
+    uptime_seconds: float
+    components: List[ComponentStatus]
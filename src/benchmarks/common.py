@@ -0,0 +1,59 @@
+import sys
+import json
+import time
+import argparse
+import statistics
+from pathlib import Path
+from typing import Optional
+
+
+class Stopwatch:
+    """
+    Context manager that records the elapsed wall time in `seconds`.
+    """
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.seconds = time.perf_counter() - self.start
+
+
+def percentiles(samples: list[float]) -> dict:
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+
+    def pick(q: float) -> float:
+        return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+    return {
+        "count": len(ordered),
+        "mean": statistics.fmean(ordered),
+        "p50": pick(0.50),
+        "p90": pick(0.90),
+        "p99": pick(0.99),
+        "max": ordered[-1],
+    }
+
+
+def progress(message: str):
+    """
+    Progress goes to stderr, so stdout holds nothing but the JSON report.
+    """
+    print(message, file=sys.stderr, flush=True)
+
+
+def add_output_argument(parser: argparse.ArgumentParser):
+    parser.add_argument("--output", type=Path, default=None, help="Write the JSON report here instead of stdout")
+
+
+def write_report(report: dict, output: Optional[Path]):
+    payload = json.dumps(report, indent=2)
+    if output is None:
+        print(payload)
+    else:
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(payload)
+        progress(f"Report written to {output}")
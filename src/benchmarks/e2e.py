@@ -0,0 +1,345 @@
+"""
+End-to-end latency, throughput and memory of the ranking pipeline on synthetic
+resumes, fully offline.
+
+    uv run python -m src.benchmarks.e2e --documents 50 --pages 2 --runs 3
+    uv run python -m src.benchmarks.e2e --models stub --formats text-pdf --output reports/e2e.json
+
+Resumes for a few roles are rendered as scanned images (png), image-only PDFs
+(pdf) and PDFs with a text layer (text-pdf), zipped, and sent through
+IngestionService and the full RankingPipeline. --models stub builds tiny randomly
+initialised models (tokenizer trained on the synthetic text) in a temporary
+directory, which measures the pipeline itself without downloads or a GPU.
+Caches point at a temporary directory and are off unless --caches is given.
+png and pdf pages need tesseract; any PDF needs poppler.
+"""
+import io
+import time
+import random
+import asyncio
+import zipfile
+import argparse
+import platform
+import resource
+import tempfile
+import subprocess
+from pathlib import Path
+import torch
+from fastapi import UploadFile
+from PIL import Image, ImageDraw, ImageFont
+from src.benchmarks.common import Stopwatch, add_output_argument, percentiles, progress, write_report
+from src.core.config import settings
+from src.core.lifecycle import components, warm_up_all
+from src.modules.ingestion import ingestion_service
+from src.modules.pipeline import ranking_pipeline
+from src.modules.vision import vision_engine
+
+FORMATS = ("png", "pdf", "text-pdf")
+
+ROLES = {
+    "backend": (
+        "Python Django FastAPI PostgreSQL Redis Kubernetes Docker AWS microservices REST APIs "
+        "designed scalable backend services reduced latency migrated monolith owned on-call"
+    ),
+    "data": (
+        "PySpark Airflow SQL dbt Snowflake Kafka pipelines data modelling warehouse ETL "
+        "built ingestion jobs improved data quality dashboards batch and streaming"
+    ),
+    "sales": (
+        "B2B sales pipeline quota CRM Salesforce negotiation enterprise accounts prospecting "
+        "closed deals exceeded targets account management customer relationships"
+    ),
+    "design": (
+        "Figma user research prototyping design systems accessibility usability testing "
+        "wireframes visual design interaction design mobile web brand guidelines"
+    ),
+}
+COMMON = "led team of delivered improved by 30% senior years experience 2018-2024 collaborated stakeholders".split()
+
+JOB_DESCRIPTION = (
+    "Senior Backend Engineer. 5+ years building Python services with Django or FastAPI, "
+    "PostgreSQL, Docker and Kubernetes on AWS. Experience designing scalable microservices."
+)
+TARGET_ROLE = "backend"
+
+LINES_PER_PAGE = 40
+
+# Stub models: a byte-level BPE vocabulary and transformers small enough for any CPU.
+STUB_VOCAB = 2000
+STUB_SPECIAL_TOKENS = ["<|endoftext|>", "<|im_start|>", "<|im_end|>"]
+STUB_CHAT_TEMPLATE = (
+    "{% for message in messages %}<|im_start|>{{ message['role'] }}\n{{ message['content'] }}<|im_end|>\n"
+    "{% endfor %}{% if add_generation_prompt %}<|im_start|>assistant\n{% endif %}"
+)
+
+
+def resume_lines(role: str, index: int, pages: int, rng: random.Random) -> list[list[str]]:
+    words = ROLES[role].split() + COMMON
+    header = [f"Candidate {index:04d}", f"{role.title()} professional", "EXPERIENCE"]
+    lines = header + [
+        " ".join(rng.choice(words) for _ in range(rng.randint(6, 10)))
+        for _ in range(pages * LINES_PER_PAGE - len(header))
+    ]
+    return [lines[start:start + LINES_PER_PAGE] for start in range(0, len(lines), LINES_PER_PAGE)]
+
+
+def render_page(lines: list[str], dpi: int) -> Image.Image:
+    width, height = int(8.5 * dpi), int(11 * dpi)
+    font = ImageFont.load_default(size=max(6, round(11 * dpi / 72)))
+    line_height = int(font.size * 1.5)
+
+    page = Image.new("L", (width, height), 255)
+    draw = ImageDraw.Draw(page)
+    for n, line in enumerate(lines):
+        draw.text((dpi, dpi + n * line_height), line, fill=0, font=font)
+    return page
+
+
+def text_pdf(pages: list[list[str]]) -> bytes:
+    """
+    A minimal PDF with one Helvetica text object per page, so pdftotext finds a text layer.
+    """
+    objects = {
+        1: b"<< /Type /Catalog /Pages 2 0 R >>",
+        3: b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    }
+    page_ids = []
+    for lines in pages:
+        page_id = 4 + 2 * len(page_ids)
+        escaped = [line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)") for line in lines]
+        stream = "\n".join(["BT /F1 11 Tf 15 TL 72 720 Td"] + [f"({line}) Tj T*" for line in escaped] + ["ET"])
+        content = stream.encode("latin-1", errors="replace")
+        objects[page_id] = (
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {page_id + 1} 0 R >>"
+        ).encode()
+        objects[page_id + 1] = b"<< /Length %d >>\nstream\n%s\nendstream" % (len(content), content)
+        page_ids.append(page_id)
+    kids = " ".join(f"{page_id} 0 R" for page_id in page_ids)
+    objects[2] = f"<< /Type /Pages /Kids [{kids}] /Count {len(page_ids)} >>".encode()
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for object_id in sorted(objects):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (object_id, objects[object_id])
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
+
+
+def encode_resume(pages: list[list[str]], fmt: str, dpi: int) -> bytes:
+    if fmt == "text-pdf":
+        return text_pdf(pages)
+
+    images = [render_page(lines, dpi) for lines in pages]
+    buffer = io.BytesIO()
+    if fmt == "pdf":
+        images[0].save(buffer, "PDF", save_all=True, append_images=images[1:], resolution=dpi)
+    else:
+        # A scanned image is one page; extra pages are stacked into one tall image.
+        sheet = Image.new("L", (images[0].width, sum(image.height for image in images)), 255)
+        for n, image in enumerate(images):
+            sheet.paste(image, (0, n * images[0].height))
+        sheet.save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def synthetic_archive(count: int, pages: int, formats: list[str], dpi: int, rng: random.Random) -> tuple[bytes, list[str]]:
+    """
+    Zip of `count` resumes cycling through the roles and formats. Returns (zip bytes, plain texts).
+    """
+    roles = list(ROLES)
+    texts = []
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        for i in range(count):
+            # Formats advance once per round of roles, so every role gets every format.
+            role, fmt = roles[i % len(roles)], formats[(i // len(roles)) % len(formats)]
+            resume = resume_lines(role, i, pages, rng)
+            texts.append("\n".join(line for page in resume for line in page))
+            extension = "pdf" if fmt.endswith("pdf") else fmt
+            archive.writestr(f"resumes/{role}_{i:04d}.{extension}", encode_resume(resume, fmt, dpi))
+    return buffer.getvalue(), texts
+
+
+def build_stub_models(directory: Path, corpus: list[str]) -> tuple[Path, Path]:
+    """
+    Saves a tiny causal LM (also used as the reranker) and a tiny sentence
+    embedder. Returns (llm path, embedder path).
+    """
+    from tokenizers import Tokenizer, decoders, models, pre_tokenizers, trainers
+    from transformers import BertConfig, BertModel, PreTrainedTokenizerFast, Qwen2Config, Qwen2ForCausalLM
+    from sentence_transformers import SentenceTransformer, models as st_models
+
+    tokenizer = Tokenizer(models.BPE())
+    tokenizer.pre_tokenizer = pre_tokenizers.ByteLevel(add_prefix_space=False)
+    tokenizer.decoder = decoders.ByteLevel()
+    tokenizer.train_from_iterator(corpus, trainers.BpeTrainer(
+        vocab_size=STUB_VOCAB,
+        special_tokens=STUB_SPECIAL_TOKENS,
+        initial_alphabet=pre_tokenizers.ByteLevel.alphabet()
+    ))
+    fast = PreTrainedTokenizerFast(
+        tokenizer_object=tokenizer,
+        eos_token="<|im_end|>",
+        pad_token="<|endoftext|>",
+        model_max_length=4096,
+        model_input_names=["input_ids", "attention_mask"]
+    )
+    fast.chat_template = STUB_CHAT_TEMPLATE
+
+    torch.manual_seed(0)
+    llm_path = directory / "llm"
+    llm = Qwen2ForCausalLM(Qwen2Config(
+        vocab_size=len(fast), hidden_size=64, intermediate_size=128, num_hidden_layers=2,
+        num_attention_heads=4, num_key_value_heads=2, max_position_embeddings=4096,
+        tie_word_embeddings=True, eos_token_id=fast.eos_token_id, pad_token_id=fast.pad_token_id
+    ))
+    llm.generation_config.eos_token_id = fast.eos_token_id
+    llm.generation_config.pad_token_id = fast.pad_token_id
+    llm.save_pretrained(llm_path)
+    fast.save_pretrained(llm_path)
+
+    encoder_path = directory / "encoder"
+    BertModel(BertConfig(
+        vocab_size=len(fast), hidden_size=64, num_hidden_layers=2, num_attention_heads=2,
+        intermediate_size=128, max_position_embeddings=512
+    )).save_pretrained(encoder_path)
+    fast.save_pretrained(encoder_path)
+
+    embedder_path = directory / "embedder"
+    word = st_models.Transformer(str(encoder_path), max_seq_length=256)
+    pooling = st_models.Pooling(word.get_word_embedding_dimension(), "mean")
+    SentenceTransformer(modules=[word, pooling, st_models.Normalize()]).save(str(embedder_path))
+
+    return llm_path, embedder_path
+
+
+async def run_once(archive: bytes, top_k: int) -> tuple[dict, list[str]]:
+    """
+    One upload through ingestion and the pipeline. Returns (seconds per stage, ranked filenames).
+    Streaming stages overlap, so their durations need not add up to the total.
+    """
+    started, seconds = {}, {}
+
+    def on_stage(stage: str, status: str, **detail):
+        now = time.perf_counter()
+        if status == "running":
+            started.setdefault(stage, now)
+        elif status == "done":
+            seconds[stage] = now - started.get(stage, now)
+
+    with Stopwatch() as total:
+        with Stopwatch() as ingest:
+            upload = await ingestion_service.ingest(UploadFile(file=io.BytesIO(archive), filename="resumes.zip"))
+        result = await ranking_pipeline.run("benchmark", upload, JOB_DESCRIPTION, top_k, on_stage=on_stage)
+
+    seconds["ingest"] = ingest.seconds
+    seconds["total"] = total.seconds
+    return seconds, [candidate.filename for candidate in result.candidates]
+
+
+def peak_rss() -> dict:
+    # ru_maxrss is in KiB on Linux. For children it is the largest single exited child
+    # (OCR workers once the pool is shut down, poppler calls); a forked child starts
+    # from the parent's footprint, so compare it across commits rather than to process_bytes.
+    return {
+        "process_bytes": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+        "largest_child_bytes": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * 1024,
+    }
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--documents", type=int, default=20)
+    parser.add_argument("--pages", type=int, default=1)
+    parser.add_argument("--formats", nargs="+", default=list(FORMATS), choices=FORMATS)
+    parser.add_argument("--dpi", type=int, default=200)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--models", choices=("real", "stub"), default="real")
+    parser.add_argument("--caches", action="store_true", help="Keep the OCR, embedding and extraction caches on")
+    parser.add_argument("--seed", type=int, default=0)
+    add_output_argument(parser)
+    args = parser.parse_args()
+
+    with Stopwatch() as generate_sw:
+        archive, texts = synthetic_archive(args.documents, args.pages, args.formats, args.dpi, random.Random(args.seed))
+
+    with tempfile.TemporaryDirectory() as scratch:
+        # Models load on first use, so settings changed here still take effect.
+        settings.CACHE_DIR = Path(scratch) / "cache"
+        if not args.caches:
+            settings.OCR_CACHE_ENABLED = False
+            settings.EMBEDDING_CACHE_ENABLED = False
+            settings.EXTRACTION_CACHE_ENABLED = False
+        if args.models == "stub":
+            llm_path, embedder_path = build_stub_models(Path(scratch) / "models", texts + [JOB_DESCRIPTION])
+            settings.LLM_MODEL_ID = settings.RERANKER_MODEL_ID = str(llm_path)
+            settings.EMBEDDING_MODEL_ID = str(embedder_path)
+
+        warm_up_all()
+        startup = [component.status() for component in components()]
+
+        stage_seconds: dict[str, list[float]] = {}
+        docs_per_s, precision = [], []
+        for run in range(args.runs):
+            seconds, ranked = asyncio.run(run_once(archive, args.top_k))
+            for stage, value in seconds.items():
+                stage_seconds.setdefault(stage, []).append(value)
+            docs_per_s.append(args.documents / seconds["total"])
+            precision.append(sum(Path(name).name.startswith(TARGET_ROLE) for name in ranked) / max(1, len(ranked)))
+            progress(f"run {run + 1}/{args.runs}: {seconds['total']:.2f}s, {docs_per_s[-1]:.2f} docs/s")
+
+        vision_engine.shutdown()
+
+    write_report({
+        "benchmark": "e2e",
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "torch": torch.__version__,
+        "device": "cuda" if torch.cuda.is_available() else "cpu",
+        "models": {
+            "mode": args.models,
+            "llm": settings.LLM_MODEL_ID if args.models == "real" else "stub",
+            "embedding": settings.EMBEDDING_MODEL_ID if args.models == "real" else "stub",
+            "reranker": (settings.RERANKER_MODEL_ID if args.models == "real" else "stub") if settings.RERANKER_ENABLED else None,
+        },
+        "dataset": {
+            "documents": args.documents,
+            "pages_per_document": args.pages,
+            "formats": args.formats,
+            "dpi": args.dpi,
+            "zip_bytes": len(archive),
+            "generate_s": generate_sw.seconds,
+        },
+        "settings": {
+            "ocr_workers": settings.OCR_WORKERS,
+            "pipeline_streaming": settings.PIPELINE_STREAMING,
+            "hybrid_search": settings.HYBRID_SEARCH,
+            "llm_batch_size": settings.LLM_BATCH_SIZE,
+            "caches": args.caches,
+        },
+        "startup": startup,
+        "stages_s": {stage: percentiles(values) for stage, values in stage_seconds.items()},
+        "docs_per_s": percentiles(docs_per_s),
+        "pages_per_s": percentiles([rate * args.pages for rate in docs_per_s]),
+        f"precision_at_{args.top_k}": percentiles(precision),
+        "peak_rss": peak_rss(),
+    }, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Embedding throughput of the token-aware chunker with length-bucketed batches
+versus the previous 300-word chunker encoded in fixed batches of 32.
+
+    uv run python -m src.benchmarks.embedding_throughput --documents 200
+
+Resumes are synthetic and vary widely in length so chunk lengths do too.
+The embedding cache is bypassed; both runs encode every chunk.
+"""
+import random
+import argparse
+from src.benchmarks.common import Stopwatch, add_output_argument, progress, write_report
+from src.core.config import settings
+from src.modules.rag import rag_engine
+
+VOCABULARY = (
+    "python django fastapi kubernetes docker aws terraform postgresql pyspark airflow "
+    "microservices led migrated delivered reduced latency 2019-2023 senior backend engineer "
+    "designed scalable pipelines mentored team of 6 improved throughput by 35%"
+).split()
+
+LEGACY_CHUNK_WORDS = 300
+LEGACY_OVERLAP_WORDS = 50
+LEGACY_BATCH_SIZE = 32
+
+
+def synthetic_documents(count: int, rng: random.Random) -> list[str]:
+    return [
+        " ".join(rng.choice(VOCABULARY) for _ in range(rng.choice([40, 120, 400, 900, 1600])))
+        for _ in range(count)
+    ]
+
+
+def legacy_chunks(text: str) -> list[str]:
+    words = text.split()
+    return [
+        " ".join(words[i:i + LEGACY_CHUNK_WORDS])
+        for i in range(0, len(words), LEGACY_CHUNK_WORDS - LEGACY_OVERLAP_WORDS)
+    ]
+
+
+def padded_tokens(batches: list[list[int]]) -> int:
+    return sum(max(batch) * len(batch) for batch in batches if batch)
+
+
+def run_legacy(texts: list[str]) -> dict:
+    with Stopwatch() as chunk_sw:
+        chunks = [chunk for text in texts for chunk in legacy_chunks(text)]
+    # Measured the way SentenceTransformer truncates them.
+    lengths = [
+        len(ids) for ids in rag_engine.embed_model.tokenizer(
+            chunks, truncation=True, max_length=rag_engine.embed_model.max_seq_length
+        ).input_ids
+    ]
+
+    with Stopwatch() as encode_sw:
+        rag_engine.embed_model.encode(
+            chunks, batch_size=LEGACY_BATCH_SIZE, convert_to_numpy=True, normalize_embeddings=True
+        )
+
+    # SentenceTransformer sorts by character length, longest first, before batching.
+    order = sorted(range(len(chunks)), key=lambda i: -len(chunks[i]))
+    batches = [
+        [lengths[i] for i in order[start:start + LEGACY_BATCH_SIZE]]
+        for start in range(0, len(order), LEGACY_BATCH_SIZE)
+    ]
+    return summarize(chunk_sw.seconds, encode_sw.seconds, lengths, padded_tokens(batches))
+
+
+def run_bucketed(texts: list[str]) -> dict:
+    with Stopwatch() as chunk_sw:
+        chunked = [chunk for text in texts for chunk in rag_engine._chunk_text(text)]
+    chunks = [chunk for chunk, _, _, _ in chunked]
+    lengths = [tokens for _, _, _, tokens in chunked]
+
+    with Stopwatch() as encode_sw:
+        rag_engine._encode_bucketed(chunks, lengths)
+
+    ordered = sorted(lengths)
+    batches, start = [], 0
+    while start < len(ordered):
+        end = start + 1
+        while end < len(ordered) and (end - start + 1) * ordered[end] <= settings.EMBEDDING_BATCH_TOKENS:
+            end += 1
+        batches.append(ordered[start:end])
+        start = end
+    return summarize(chunk_sw.seconds, encode_sw.seconds, lengths, padded_tokens(batches))
+
+
+def summarize(chunk_seconds: float, encode_seconds: float, lengths: list[int], padded: int) -> dict:
+    real = sum(lengths)
+    total = chunk_seconds + encode_seconds
+    return {
+        "chunks": len(lengths),
+        "tokens": real,
+        "padded_tokens": padded,
+        "padding_overhead": padded / real - 1 if real else None,
+        "chunk_s": chunk_seconds,
+        "encode_s": encode_seconds,
+        "chunks_per_s": len(lengths) / total if total else None,
+        "tokens_per_s": real / total if total else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--documents", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    add_output_argument(parser)
+    args = parser.parse_args()
+
+    texts = [rag_engine.clean_ocr_text(text) for text in synthetic_documents(args.documents, random.Random(args.seed))]
+
+    # Warm up so neither run pays for first-call initialisation.
+    rag_engine.embed_model.encode(texts[:2], convert_to_numpy=True)
+
+    results = {"legacy": run_legacy(texts), "bucketed": run_bucketed(texts)}
+    for name, row in results.items():
+        progress(
+            f"{name:9s} chunks={row['chunks']:6d} padding=+{row['padding_overhead']:.0%} "
+            f"encode={row['encode_s']:7.2f}s tokens/s={row['tokens_per_s']:9.0f}"
+        )
+
+    write_report({
+        "benchmark": "embedding_throughput",
+        "model": settings.EMBEDDING_MODEL_ID,
+        "documents": args.documents,
+        "chunk_tokens": rag_engine.max_tokens,
+        "batch_tokens": settings.EMBEDDING_BATCH_TOKENS,
+        "results": results,
+    }, args.output)
+
+
+if __name__ == "__main__":
+    main()
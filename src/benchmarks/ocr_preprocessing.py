@@ -0,0 +1,138 @@
+"""
+OCR time and character accuracy of the fixed 2x-upscale preprocessing versus
+the adaptive mode (text-height rescaling, margin cropping, blank-page skipping).
+
+    uv run python -m src.benchmarks.ocr_preprocessing --dpi 150 200 300 --pages 4
+    uv run python -m src.benchmarks.ocr_preprocessing --samples ./ocr_samples
+
+Synthetic pages are rendered with known text at each DPI. With --samples, every
+image in the directory is used with the ground truth from its sibling `.txt` file.
+Requires the tesseract binary.
+"""
+import random
+import argparse
+from pathlib import Path
+import cv2
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+from src.benchmarks.common import Stopwatch, percentiles, add_output_argument, progress, write_report
+from src.modules.vision import vision_engine, IMAGE_EXTENSIONS
+
+MODES = ("fixed", "adaptive")
+VOCABULARY = (
+    "Senior Software Engineer Python Django FastAPI Kubernetes Docker AWS Terraform "
+    "PostgreSQL Spark pipelines microservices led migrated delivered reduced latency "
+    "by 40% 2019-2023 University Bachelor Computer Science Skills Experience Projects"
+).split()
+
+
+def synthetic_page(dpi: int, rng: random.Random, point_size: int = 11) -> tuple[bytes, str]:
+    """
+    A Letter page of random resume-like lines at the given DPI, as PNG bytes plus its text.
+    """
+    width, height = int(8.5 * dpi), int(11 * dpi)
+    margin = dpi
+    font = ImageFont.load_default(size=max(6, round(point_size * dpi / 72)))
+    line_height = int(font.size * 1.5)
+
+    page = Image.new("L", (width, height), 255)
+    draw = ImageDraw.Draw(page)
+    lines = []
+    y = margin
+    while y + line_height < height - margin and len(lines) < 40:
+        line = " ".join(rng.choice(VOCABULARY) for _ in range(rng.randint(5, 9)))
+        if draw.textlength(line, font=font) > width - 2 * margin:
+            continue
+        draw.text((margin, y), line, fill=0, font=font)
+        lines.append(line)
+        y += line_height
+
+    return cv2.imencode(".png", np.asarray(page))[1].tobytes(), "\n".join(lines)
+
+
+def blank_page(dpi: int) -> bytes:
+    page = np.full((int(11 * dpi), int(8.5 * dpi)), 250, dtype=np.uint8)
+    return cv2.imencode(".png", page)[1].tobytes()
+
+
+def load_samples(directory: Path) -> list[tuple[str, bytes, str]]:
+    samples = []
+    for path in sorted(directory.iterdir()):
+        truth = path.with_suffix(".txt")
+        if path.suffix.lower() in IMAGE_EXTENSIONS and truth.exists():
+            samples.append((path.name, path.read_bytes(), truth.read_text()))
+    return samples
+
+
+def edit_distance(a: str, b: str) -> int:
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        previous = current
+    return previous[-1]
+
+
+def char_accuracy(ocr_text: str, truth: str) -> float:
+    ocr_text, truth = " ".join(ocr_text.split()), " ".join(truth.split())
+    if not truth:
+        return 1.0 if not ocr_text else 0.0
+    return max(0.0, 1 - edit_distance(ocr_text, truth) / len(truth))
+
+
+def run_mode(mode: str, pages: list[tuple[str, bytes, str]]) -> dict:
+    vision_engine.preprocessing = mode
+    seconds, accuracies, rows = [], [], []
+    for name, data, truth in pages:
+        with Stopwatch() as sw:
+            text = vision_engine._ocr_page(data, False, None)
+        accuracy = char_accuracy(text, truth)
+        seconds.append(sw.seconds)
+        accuracies.append(accuracy)
+        rows.append({"page": name, "seconds": sw.seconds, "char_accuracy": accuracy})
+        progress(f"{mode:8s} {name:24s} {sw.seconds:7.3f}s accuracy={accuracy:.3f}")
+
+    return {
+        "total_s": sum(seconds),
+        "page_s": percentiles(seconds),
+        "mean_char_accuracy": sum(accuracies) / len(accuracies) if accuracies else None,
+        "pages": rows,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--dpi", type=int, nargs="+", default=[150, 200, 300])
+    parser.add_argument("--pages", type=int, default=3, help="Synthetic pages per DPI")
+    parser.add_argument("--blank-pages", type=int, default=1)
+    parser.add_argument("--samples", type=Path, default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    add_output_argument(parser)
+    args = parser.parse_args()
+
+    if args.samples is not None:
+        pages = load_samples(args.samples)
+    else:
+        rng = random.Random(args.seed)
+        pages = []
+        for dpi in args.dpi:
+            for n in range(args.pages):
+                data, truth = synthetic_page(dpi, rng)
+                pages.append((f"synthetic-{dpi}dpi-{n}", data, truth))
+        pages += [(f"blank-{n}", blank_page(args.dpi[-1]), "") for n in range(args.blank_pages)]
+
+    results = {mode: run_mode(mode, pages) for mode in MODES}
+    fixed, adaptive = results["fixed"]["total_s"], results["adaptive"]["total_s"]
+
+    write_report({
+        "benchmark": "ocr_preprocessing",
+        "tesseract_config": vision_engine.custom_config,
+        "pages": len(pages),
+        "speedup": fixed / adaptive if adaptive else None,
+        "results": results,
+    }, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+"""
+Speed, size and quality of the embedder and the LLM under each precision mode.
+
+    uv run python -m src.benchmarks.precision --modes fp32 bf16 int8 --candidates 16
+
+fp32 is the reference: embeddings are compared to it by cosine similarity and
+top-k overlap against a fixed JD, Stage-1 scores by rank correlation and top-1
+agreement. Each mode loads its own copy of the models and only one copy is
+held at a time; the app's module-level instances load lazily and are never
+touched here, so they add no weights.
+"""
+import io
+import gc
+import random
+import argparse
+import numpy as np
+import torch
+from src.benchmarks.common import Stopwatch, add_output_argument, percentiles, progress, write_report
+from src.core.config import settings
+from src.core.precision import PRECISIONS
+from src.modules.analysis import LLMRanker
+from src.modules.rag import RAGEngine
+
+VOCABULARY = (
+    "python django fastapi kubernetes docker aws terraform postgresql pyspark airflow "
+    "microservices led migrated delivered reduced latency 2019-2023 senior backend engineer "
+    "designed scalable pipelines mentored team of 6 improved throughput by 35% java sales "
+    "marketing accounting excel recruiting customer support retail"
+).split()
+
+JOB_DESCRIPTION = (
+    "Senior backend engineer: 5+ years of Python, FastAPI or Django, PostgreSQL, "
+    "Docker and Kubernetes on AWS; experience designing scalable data pipelines."
+)
+
+REFERENCE = "fp32"
+
+
+def synthetic_resumes(count: int, words: int, rng: random.Random) -> list[str]:
+    return [" ".join(rng.choice(VOCABULARY) for _ in range(words)) for _ in range(count)]
+
+
+def model_bytes(model: torch.nn.Module) -> int:
+    # Serialized size, so packed int8 weights count as what they actually store.
+    buffer = io.BytesIO()
+    torch.save(model.state_dict(), buffer)
+    return buffer.tell()
+
+
+def ranks(values: np.ndarray) -> np.ndarray:
+    order = np.argsort(values, kind="stable")
+    result = np.empty(len(values), dtype=np.float64)
+    result[order] = np.arange(len(values))
+    return result
+
+
+def spearman(a: list[float], b: list[float]) -> float | None:
+    if len(a) < 2:
+        return None
+    ra, rb = ranks(np.asarray(a)), ranks(np.asarray(b))
+    if ra.std() == 0 or rb.std() == 0:
+        return None
+    return float(np.corrcoef(ra, rb)[0, 1])
+
+
+def run_embedder(precision: str, texts: list[str], repeats: int) -> tuple:
+    engine = RAGEngine(precision=precision)
+    engine.embed_model.encode(texts[:2], convert_to_numpy=True)
+
+    latencies = []
+    for _ in range(repeats):
+        with Stopwatch() as sw:
+            vectors = engine.embed_model.encode(texts, convert_to_numpy=True, normalize_embeddings=True)
+        latencies.append(sw.seconds)
+    query = engine.embed_query(JOB_DESCRIPTION)
+
+    row = {"latency_s": percentiles(latencies), "model_bytes": model_bytes(engine.embed_model)}
+    del engine
+    gc.collect()
+    return row, vectors.astype(np.float32), query.astype(np.float32)
+
+
+def run_llm(precision: str, contexts: list[str]) -> tuple:
+    ranker = LLMRanker(precision=precision)
+    with Stopwatch() as sw:
+        results = ranker._analyze_batch(JOB_DESCRIPTION, contexts)
+
+    scores = []
+    for result in results:
+        try:
+            scores.append(float(result.get("score")))
+        except (AttributeError, TypeError, ValueError):
+            scores.append(None)
+
+    row = {
+        "latency_s": sw.seconds,
+        "per_candidate_s": sw.seconds / len(contexts) if contexts else None,
+        "parse_rate": sum(score is not None for score in scores) / len(scores) if scores else None,
+        "model_bytes": model_bytes(ranker.model),
+    }
+    del ranker
+    gc.collect()
+    return row, scores
+
+
+def compare_embeddings(vectors: np.ndarray, query: np.ndarray, reference: tuple, k: int) -> dict:
+    ref_vectors, ref_query = reference
+    cosine = np.sum(vectors * ref_vectors, axis=1)
+    top = set(np.argsort(-(vectors @ query[0]))[:k])
+    ref_top = set(np.argsort(-(ref_vectors @ ref_query[0]))[:k])
+    return {
+        "cosine_to_fp32": {"mean": float(cosine.mean()), "min": float(cosine.min())},
+        f"top{k}_overlap": len(top & ref_top) / k,
+    }
+
+
+def compare_scores(scores: list, reference: list) -> dict:
+    pairs = [(a, b) for a, b in zip(scores, reference) if a is not None and b is not None]
+    top1 = None
+    if pairs:
+        top1 = int(np.argmax([a for a, _ in pairs]) == np.argmax([b for _, b in pairs]))
+    return {
+        "spearman_to_fp32": spearman([a for a, _ in pairs], [b for _, b in pairs]),
+        "top1_agreement": top1,
+        "compared": len(pairs),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--modes", nargs="+", default=["fp32", "bf16", "int8"], choices=sorted(PRECISIONS))
+    parser.add_argument("--candidates", type=int, default=16)
+    parser.add_argument("--words", type=int, default=250)
+    parser.add_argument("--chunks", type=int, default=256)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--skip-llm", action="store_true")
+    parser.add_argument("--seed", type=int, default=0)
+    add_output_argument(parser)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    chunks = synthetic_resumes(args.chunks, 120, rng)
+    contexts = synthetic_resumes(args.candidates, args.words, rng)
+
+    # The reference always runs first, even if not asked for by name.
+    modes = [REFERENCE] + [mode for mode in args.modes if mode != REFERENCE]
+    embedder, llm = {}, {}
+    reference_vectors, reference_scores = None, None
+
+    for mode in modes:
+        row, vectors, query = run_embedder(mode, chunks, args.repeats)
+        if reference_vectors is None:
+            reference_vectors = (vectors, query)
+        row.update(compare_embeddings(vectors, query, reference_vectors, min(args.top_k, len(chunks))))
+        embedder[mode] = row
+        progress(
+            f"embedder {mode:5s} p50={row['latency_s']['p50']:7.3f}s size={row['model_bytes'] / 2**20:8.1f}MiB "
+            f"cos={row['cosine_to_fp32']['mean']:.4f}"
+        )
+
+        if args.skip_llm:
+            continue
+        row, scores = run_llm(mode, contexts)
+        if reference_scores is None:
+            reference_scores = scores
+        row.update(compare_scores(scores, reference_scores))
+        llm[mode] = row
+        progress(
+            f"llm      {mode:5s} total={row['latency_s']:7.2f}s size={row['model_bytes'] / 2**20:8.1f}MiB "
+            f"parsed={row['parse_rate']:.0%} spearman={row['spearman_to_fp32']}"
+        )
+
+    write_report({
+        "benchmark": "precision",
+        "embedding_model": settings.EMBEDDING_MODEL_ID,
+        "llm_model": settings.LLM_MODEL_ID,
+        "device": "cuda" if torch.cuda.is_available() else "cpu",
+        "candidates": args.candidates,
+        "chunks": args.chunks,
+        "embedder": embedder,
+        "llm": llm,
+    }, args.output)
+
+
+if __name__ == "__main__":
+    main()
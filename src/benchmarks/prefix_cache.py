@@ -0,0 +1,100 @@
+"""
+Prefill cost of Stage-1 extraction prompts with and without the shared-prefix KV cache.
+
+    uv run python -m src.benchmarks.prefix_cache --candidates 16 --jd-words 50 200 800 1600
+
+Only the prompt forward pass is timed; decoding is identical in both modes.
+"""
+import copy
+import random
+import argparse
+import torch
+from transformers import DynamicCache
+from src.benchmarks.common import Stopwatch, add_output_argument, progress, write_report
+from src.core.config import settings
+from src.modules.analysis import llm_ranker
+
+VOCABULARY = (
+    "python django fastapi kubernetes docker aws terraform sql postgres spark "
+    "pipelines microservices testing leadership design architecture api latency "
+    "scalable reliable production migrated delivered owned mentored shipped"
+).split()
+
+
+def synthetic_text(words: int, rng: random.Random) -> str:
+    return " ".join(rng.choice(VOCABULARY) for _ in range(words))
+
+
+def prefill_full(prompts: list[str]) -> float:
+    with Stopwatch() as sw:
+        for prompt in prompts:
+            ids = llm_ranker.tokenizer(prompt, return_tensors="pt").input_ids.to(llm_ranker.model.device)
+            with torch.no_grad():
+                llm_ranker.model(input_ids=ids, past_key_values=DynamicCache(), use_cache=True)
+    return sw.seconds
+
+
+def prefill_cached(jd: str, contexts: list[str]) -> float:
+    with Stopwatch() as sw:
+        prefix_ids, prefix_cache, suffix_text = llm_ranker._build_prompt_prefix(jd)
+        for context in contexts:
+            ids = llm_ranker.tokenizer(
+                context + suffix_text, return_tensors="pt", add_special_tokens=False
+            ).input_ids.to(llm_ranker.model.device)
+            with torch.no_grad():
+                llm_ranker.model(input_ids=ids, past_key_values=copy.deepcopy(prefix_cache), use_cache=True)
+    return sw.seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--candidates", type=int, default=16)
+    parser.add_argument("--context-words", type=int, default=300)
+    parser.add_argument("--jd-words", type=int, nargs="+", default=[50, 200, 800, 1600])
+    parser.add_argument("--seed", type=int, default=0)
+    add_output_argument(parser)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    contexts = [synthetic_text(args.context_words, rng) for _ in range(args.candidates)]
+
+    # Warm up kernels so the first measurement is not penalised.
+    prefill_cached(synthetic_text(20, rng), contexts[:1])
+
+    rows = []
+    for jd_words in args.jd_words:
+        jd = synthetic_text(jd_words, rng)
+        prompts = [
+            llm_ranker._render_prompt(llm_ranker._build_extraction_messages(jd, context))
+            for context in contexts
+        ]
+        prefix_tokens = llm_ranker._build_prompt_prefix(jd)[0].shape[1]
+
+        full_seconds = prefill_full(prompts)
+        cached_seconds = prefill_cached(jd, contexts)
+
+        rows.append({
+            "jd_words": jd_words,
+            "prefix_tokens": prefix_tokens,
+            "full_prefill_s": full_seconds,
+            "cached_prefill_s": cached_seconds,
+            "speedup": full_seconds / cached_seconds if cached_seconds else None,
+        })
+        progress(
+            f"jd_words={jd_words:5d} prefix_tokens={prefix_tokens:5d} "
+            f"full={full_seconds:7.3f}s cached={cached_seconds:7.3f}s "
+            f"speedup={rows[-1]['speedup']:.2f}x"
+        )
+
+    write_report({
+        "benchmark": "prefix_cache",
+        "model": settings.LLM_MODEL_ID,
+        "device": str(llm_ranker.model.device),
+        "candidates": args.candidates,
+        "context_words": args.context_words,
+        "results": rows,
+    }, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,269 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+import numpy as np
+from pathlib import Path
+from typing import Any, List, Optional, Tuple
+
+
+def sha256_file(path: Path, block_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def sha256_bytes(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def sha256_text(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class DiskCache:
+    """
+    Persistent JSON key/value store backed by SQLite.
+    Bounded by total value size with least-recently-used eviction.
+    """
+
+    def __init__(self, path: Path, max_bytes: int, ttl_seconds: Optional[float] = None):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, "
+            "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_accessed ON entries (accessed_at)")
+        self._conn.commit()
+        self._size = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+    def get(self, key: str) -> Optional[Any]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, size, created_at FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+
+            if row is not None and self.ttl_seconds is not None and now - row[2] > self.ttl_seconds:
+                self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self._conn.commit()
+                self._size -= row[1]
+                self.evictions += 1
+                row = None
+
+            if row is None:
+                self.misses += 1
+                return None
+
+            self._conn.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+
+        return json.loads(row[0])
+
+    def set(self, key: str, value: Any):
+        payload = json.dumps(value)
+        size = len(payload.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+
+        now = time.time()
+        with self._lock:
+            old = self._conn.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+            if old is not None:
+                self._size -= old[0]
+
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, payload, size, now, now)
+            )
+            self._size += size
+            self._evict()
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM entries")
+            self._conn.commit()
+            self._size = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "entries": entries,
+            "size_bytes": self._size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def _evict(self):
+        """
+        Drops least-recently-used entries until the store fits its budget.
+        Caller must hold the lock.
+        """
+        if self.ttl_seconds is not None:
+            cutoff = time.time() - self.ttl_seconds
+            expired = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries WHERE created_at < ?", (cutoff,)
+            ).fetchone()
+            if expired[0]:
+                self._conn.execute("DELETE FROM entries WHERE created_at < ?", (cutoff,))
+                self._size -= expired[1]
+                self.evictions += expired[0]
+
+        while self._size > self.max_bytes:
+            rows = self._conn.execute(
+                "SELECT key, size FROM entries ORDER BY accessed_at ASC LIMIT 64"
+            ).fetchall()
+            if not rows:
+                self._size = 0
+                break
+            for key, size in rows:
+                if self._size <= self.max_bytes:
+                    break
+                self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self._size -= size
+                self.evictions += 1
+
+
+def hash64(text: str) -> int:
+    """
+    First 8 bytes of SHA-256 as an unsigned int; 0 is reserved for empty slots.
+    """
+    return int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little") or 1
+
+
+class VectorCache:
+    """
+    Fixed-capacity float32 vector store in a memory-mapped file.
+    Rows are addressed by 64-bit content hashes through a compact key array
+    (persisted next to the vectors); when full, least-recently-used rows are recycled.
+    """
+
+    def __init__(self, directory: Path, dimension: int, capacity: int):
+        self.directory = directory
+        self.dimension = dimension
+        self.capacity = capacity
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        directory.mkdir(parents=True, exist_ok=True)
+        vectors_path = directory / "vectors.f32"
+        index_path = directory / "index.npz"
+        meta = {"dimension": dimension, "capacity": capacity}
+
+        reuse = False
+        meta_path = directory / "meta.json"
+        if meta_path.exists() and vectors_path.exists() and index_path.exists():
+            reuse = json.loads(meta_path.read_text()) == meta
+
+        self._vectors = np.memmap(
+            vectors_path, dtype=np.float32, mode="r+" if reuse else "w+", shape=(capacity, dimension)
+        )
+        if reuse:
+            with np.load(index_path) as data:
+                self._keys = data["keys"].copy()
+                self._last_used = data["last_used"].copy()
+        else:
+            self._keys = np.zeros(capacity, dtype=np.uint64)
+            self._last_used = np.zeros(capacity, dtype=np.uint64)
+            meta_path.write_text(json.dumps(meta))
+
+        self._index_path = index_path
+        self._rows = {int(key): row for row, key in enumerate(self._keys) if key != 0}
+        self._clock = int(self._last_used.max()) if capacity else 0
+
+    def get_many(self, keys: List[int]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns (hit mask, vectors); rows for misses are zero.
+        """
+        found = np.zeros(len(keys), dtype=bool)
+        vectors = np.zeros((len(keys), self.dimension), dtype=np.float32)
+
+        with self._lock:
+            self._clock += 1
+            for i, key in enumerate(keys):
+                row = self._rows.get(key)
+                if row is None:
+                    continue
+                found[i] = True
+                vectors[i] = self._vectors[row]
+                self._last_used[row] = self._clock
+
+            self.hits += int(found.sum())
+            self.misses += len(keys) - int(found.sum())
+
+        return found, vectors
+
+    def put_many(self, keys: List[int], vectors: np.ndarray):
+        with self._lock:
+            self._clock += 1
+            pending = {}
+            for key, vector in zip(keys, vectors):
+                if key not in self._rows:
+                    pending.setdefault(key, vector)
+            new = list(pending.items())[:self.capacity]
+            if not new:
+                return
+
+            rows = self._free_rows(len(new))
+            for row, (key, vector) in zip(rows, new):
+                self._keys[row] = key
+                self._last_used[row] = self._clock
+                self._vectors[row] = vector
+                self._rows[key] = row
+
+            self._vectors.flush()
+            tmp_path = self._index_path.with_name("index.tmp.npz")
+            np.savez(tmp_path, keys=self._keys, last_used=self._last_used)
+            os.replace(tmp_path, self._index_path)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._rows),
+            "capacity": self.capacity,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def _free_rows(self, count: int) -> np.ndarray:
+        """
+        Empty rows first, then the least recently used ones. Caller must hold the lock.
+        """
+        empty = np.flatnonzero(self._keys == 0)[:count]
+        if len(empty) == count:
+            return empty
+
+        needed = count - len(empty)
+        occupied = np.flatnonzero(self._keys != 0)
+        victims = occupied[np.argpartition(self._last_used[occupied], needed - 1)[:needed]]
+        for row in victims:
+            del self._rows[int(self._keys[row])]
+            self._keys[row] = 0
+        self.evictions += needed
+        return np.concatenate([empty, victims])
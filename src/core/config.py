@@ -1,3 +1,4 @@
+import os
 from pydantic_settings import BaseSettings
 from pathlib import Path
 
@@ -7,15 +8,72 @@ class Settings(BaseSettings):
     
     BASE_DIR: Path = Path(__file__).resolve().parent.parent.parent
     UPLOAD_DIR: Path = BASE_DIR / "temp_uploads"
+    CACHE_DIR: Path = BASE_DIR / "cache"
+    CORPUS_DIR: Path = BASE_DIR / "corpora"
     
     MAX_UPLOAD_SIZE_BYTES: int = 50 * 1024 * 1024  # 50 MB limit for Zip
     MAX_EXTRACTED_SIZE_BYTES: int = 500 * 1024 * 1024 # 500 MB limit extracted
     MAX_FILE_COUNT: int = 500 # Max files inside zip
+    MAX_BATCH_JOB_DESCRIPTIONS: int = 10 # Job descriptions per /rank/batch request
+    STREAM_INGESTION: bool = True # Read zip members in memory instead of extracting to UPLOAD_DIR
+
+    # OCR processes; 1 = sequential in-process OCR. Each worker is its own process
+    # (~70 MB of imports, a page raster of up to OCR_MAX_PAGE_PIXELS bytes and
+    # Tesseract's buffers: budget ~250 MB), so raise it with the RAM, not just the cores.
+    OCR_WORKERS: int = min(4, os.cpu_count() or 1)
+    PDF_TEXT_LAYER: bool = True # Use embedded PDF text where valid; OCR only pages without it
+    OCR_PREPROCESSING: str = "fixed" # fixed (PDFs rendered at 600 DPI, images upscaled 2x) | adaptive (rescale to measured text height, crop margins, skip blank pages)
+    OCR_MAX_PAGE_PIXELS: int = 36_000_000 # Grayscale raster ceiling per page (~36 MB; Letter at 600 DPI fits)
+    OCR_CACHE_ENABLED: bool = True
+    OCR_CACHE_MAX_BYTES: int = 512 * 1024 * 1024 # 512 MB of cached OCR text
     
 
     EMBEDDING_MODEL_ID: str = "Qwen/Qwen3-Embedding-0.6B" 
+    EMBEDDING_PRECISION: str = "auto" # auto | fp32 | bf16 | int8 (dynamic quantization on CPU)
+    EMBEDDING_CACHE_ENABLED: bool = True
+    CHUNK_TOKENS: int = 384 # Embedding tokens per chunk (capped by the model's max_seq_length)
+    CHUNK_OVERLAP_TOKENS: int = 64
+    EMBEDDING_BATCH_TOKENS: int = 16384 # Padded tokens per embedding batch; chunks are bucketed by length
+    EMBEDDING_CACHE_CAPACITY: int = 100_000 # Cached chunk vectors (memory-mapped, LRU)
+    HYBRID_SEARCH: bool = True # Fuse BM25 hits with the dense FAISS hits
+    HYBRID_FUSION: str = "rrf" # rrf | weighted (min-max normalised scores)
+    HYBRID_DENSE_RATIO: float = 0.6 # Share of k fetched from the dense index
+    HYBRID_DENSE_WEIGHT: float = 0.5 # Dense weight for weighted fusion
+    HYBRID_RRF_K: int = 60
     RERANKER_MODEL_ID: str = "Qwen/Qwen3-Reranker-0.6B"
+    RERANKER_ENABLED: bool = True
+    RERANKER_BATCH_SIZE: int = 16 # JD-chunk pairs per forward pass
+    RERANKER_MAX_LENGTH: int = 1024 # Tokens per pair; chunks are truncated to fit
+    RERANKER_CONTEXT_TOKENS: int = 600 # Chunk tokens kept per candidate for Stage 1
+    PREFILTER_TOP_N: int = 20 # Max documents sent to the LLM stages (never below top_k; 0 = off)
+    PREFILTER_MAX_WEIGHT: float = 0.7 # Document score = w * max + (1 - w) * mean chunk similarity
     LLM_MODEL_ID: str = "Qwen/Qwen3-0.6B"
+    LLM_PRECISION: str = "auto" # auto | fp32 | bf16 | int8 (CPU: dynamic quantization, CUDA: bitsandbytes); also the reranker
+    LLM_BATCH_SIZE: int = 8 # Stage-1 prompts per generate call (1 = one thread per candidate)
+    LLM_PREFIX_CACHE: bool = True # Prefill the shared system+JD prompt prefix once per job
+    LLM_STRUCTURED_DECODING: bool = True # Schema-keyed JSON output, stop at the closing brace
+    EXTRACTION_CACHE_ENABLED: bool = True # Reuse Stage-1 profiles for the same (JD, candidate context, model)
+    EXTRACTION_CACHE_MAX_BYTES: int = 64 * 1024 * 1024 # 64 MB of cached profiles (LRU)
+    EXTRACTION_CACHE_TTL_SECONDS: int = 7 * 24 * 3600 # Profiles older than this are re-extracted
+    JUDGE_GROUP_SIZE: int = 8 # Max candidates per judge call, at least 2 (0 = one roster for everyone)
+    JUDGE_SEED: int = 0 # Seed for assigning candidates to judge groups
+
+    MODEL_WARMUP: bool = True # Load and warm every model in the background at startup (False = load on first use)
+    PIPELINE_STREAMING: bool = True # Overlap OCR with chunk embedding and retrieval (/rank, /rank/batch and /rank/stream)
+    PIPELINE_QUEUE_SIZE: int = 32 # OCR'd documents buffered ahead of the embedding stage
+    EMBEDDING_MICRO_BATCH: int = 16 # Max documents per embedding call when streaming
+    JOB_WORKERS: int = 1 # Ranking jobs running at once (they share the models)
+    JOB_QUEUE_SIZE: int = 16 # Jobs allowed to wait; beyond this requests get 429
+    JOB_RETRY_AFTER_SECONDS: int = 30
+    JOB_TIMINGS: bool = False # Add a per-job span/stage/token breakdown ("timings") to ranking responses
+    JOB_RESULT_TTL_SECONDS: int = 3600 # Keep finished job results for polling this long
+    STREAM_HEARTBEAT_SECONDS: float = 15.0 # Idle interval before /rank/stream sends a keep-alive (0 = never)
+
+    CORPUS_INDEX_TYPE: str = "flat" # flat | ivf | hnsw (ivf/hnsw for corpora past ~100k chunks)
+    CORPUS_IVF_NLIST: int = 1024 # Max lists; IVF corpora stay flat until ~16 lists can be trained, then grow
+    CORPUS_IVF_NPROBE: int = 16
+    CORPUS_HNSW_M: int = 32
+    CORPUS_HNSW_EF_SEARCH: int = 128
     
 
     class Config:
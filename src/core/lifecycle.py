@@ -0,0 +1,120 @@
+import time
+import threading
+from typing import Dict, List, Optional
+from src.core.logger import app_logger
+
+_components: List["Component"] = []
+_started_at = time.time()
+_warmup_done = threading.Event()
+
+
+class Component:
+    """
+    A service part with expensive setup (model weights, worker pools).
+    Construction stays cheap; _load() runs once, on first use of an attribute
+    it sets or from the startup warmup, and its duration is recorded.
+    """
+
+    name = "component"
+
+    def __init__(self):
+        self._loaded = False
+        # Thread running _load(), so its own lookups of unset attributes fail normally.
+        self._loader: Optional[int] = None
+        self._load_lock = threading.RLock()
+        self.load_seconds: Optional[float] = None
+        self.warmup_seconds: Optional[float] = None
+        self.error: Optional[str] = None
+
+    def __getattr__(self, name: str):
+        # Only reached for attributes that do not exist yet, i.e. the ones _load() sets.
+        if name.startswith("_") or self.__dict__.get("_loaded", True) or self._loader == threading.get_ident():
+            raise AttributeError(f"'{type(self).__name__}' object has no attribute '{name}'")
+        self.load()
+        return object.__getattribute__(self, name)
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    def load(self):
+        if self._loaded:
+            return
+        with self._load_lock:
+            if self._loaded or self._loader is not None:
+                return
+            self._loader = threading.get_ident()
+            start = time.perf_counter()
+            try:
+                self._load()
+            except Exception as e:
+                self.error = str(e)
+                raise
+            finally:
+                self._loader = None
+            self.load_seconds = time.perf_counter() - start
+            self.error = None
+            self._loaded = True
+        app_logger.info(f"{self.name}: loaded in {self.load_seconds:.2f}s")
+
+    def warmup(self):
+        """
+        Loads, then runs one dummy call so kernel selection and lazy
+        allocations happen before the first real request.
+        """
+        self.load()
+        start = time.perf_counter()
+        self._warmup()
+        self.warmup_seconds = time.perf_counter() - start
+        app_logger.info(f"{self.name}: warmed up in {self.warmup_seconds:.2f}s")
+
+    def status(self) -> Dict:
+        state = "ready" if self._loaded else "failed" if self.error else "loading" if self._loader is not None else "pending"
+        return {
+            "name": self.name,
+            "state": state,
+            "load_seconds": self.load_seconds,
+            "warmup_seconds": self.warmup_seconds,
+            "error": self.error,
+        }
+
+    def _load(self):
+        pass
+
+    def _warmup(self):
+        pass
+
+
+def register(component: Component) -> Component:
+    """
+    Adds a service-wide instance to warmup and readiness reporting.
+    """
+    _components.append(component)
+    return component
+
+
+def components() -> List[Component]:
+    return list(_components)
+
+
+def uptime_seconds() -> float:
+    return time.time() - _started_at
+
+
+def warmup_finished() -> bool:
+    return _warmup_done.is_set()
+
+
+def warm_up_all():
+    """
+    Loads and warms every registered component in turn. A failure is logged and
+    left in that component's status; the others still load.
+    """
+    start = time.perf_counter()
+    for component in components():
+        try:
+            component.warmup()
+        except Exception as e:
+            app_logger.error(f"{component.name}: warmup failed: {e}")
+    _warmup_done.set()
+    app_logger.info(f"Warmup finished in {time.perf_counter() - start:.2f}s")
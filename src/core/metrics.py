@@ -0,0 +1,182 @@
+import time
+import bisect
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+PREFIX = "resume_ranker"
+
+# Seconds; wide enough for a 2 ms FAISS search and a multi-minute judge call.
+TIME_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _labels(key: LabelKey) -> str:
+    return "{" + ",".join(f'{name}="{value}"' for name, value in key) + "}" if key else ""
+
+
+class Histogram:
+    """
+    Prometheus-style cumulative histogram with one series per label set.
+    """
+
+    def __init__(self, name: str, help_text: str, buckets: Tuple[float, ...] = TIME_BUCKETS):
+        self.name = f"{PREFIX}_{name}"
+        self.help_text = help_text
+        self.buckets = buckets
+        self._series: Dict[LabelKey, List] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # [count per bucket (+Inf last), sum]
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][bisect.bisect_left(self.buckets, value)] += 1
+            series[1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {key: (list(counts), total) for key, (counts, total) in sorted(self._series.items())}
+        for key, (counts, total) in series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                bucket_key = key + (("le", le),)
+                lines.append(f"{self.name}_bucket{_labels(bucket_key)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(key)} {total}")
+            lines.append(f"{self.name}_count{_labels(key)} {cumulative}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str):
+        self.name = f"{PREFIX}_{name}_total"
+        self.help_text = help_text
+        self._values: Dict[LabelKey, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels: str):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = sorted(self._values.items())
+        lines.extend(f"{self.name}{_labels(key)} {value}" for key, value in values)
+        return lines
+
+
+span_seconds = Histogram("span_seconds", "Wall time of instrumented steps (zip handling, OCR pages, encode, search, generate).")
+stage_seconds = Histogram("stage_seconds", "Wall time of each pipeline stage within a job.")
+job_seconds = Histogram("job_seconds", "Ranking job wall time from submission to completion.")
+job_queue_seconds = Histogram("job_queue_seconds", "Time a ranking job waited for a worker slot.")
+llm_tokens = Counter("llm_tokens", "LLM tokens by call kind and type (prompt, cached_prompt, generated).")
+
+METRICS = (span_seconds, stage_seconds, job_seconds, job_queue_seconds, llm_tokens)
+
+
+class JobTimer:
+    """
+    Per-job totals, shared by every thread working on the job through the
+    context variable set by start_job().
+    """
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.spans: Dict[str, List] = {}
+        self.stages: Dict[str, float] = {}
+        self.tokens: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def add_span(self, name: str, seconds: float):
+        with self._lock:
+            entry = self.spans.setdefault(name, [0, 0.0])
+            entry[0] += 1
+            entry[1] += seconds
+
+    def add_stage(self, stage: str, seconds: float):
+        with self._lock:
+            self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def add_tokens(self, kind: str, amount: int):
+        with self._lock:
+            self.tokens[kind] = self.tokens.get(kind, 0) + amount
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                "wall_seconds": time.perf_counter() - self.started_at,
+                "spans": {name: {"calls": calls, "seconds": seconds} for name, (calls, seconds) in self.spans.items()},
+                "stages": dict(self.stages),
+                "tokens": dict(self.tokens),
+            }
+
+
+_job_timer: contextvars.ContextVar[Optional[JobTimer]] = contextvars.ContextVar("job_timer", default=None)
+
+
+def start_job() -> JobTimer:
+    """
+    Starts per-job accounting for the current context. Tasks created and
+    threads started (asyncio.to_thread) from here on report into it.
+    """
+    timer = JobTimer()
+    _job_timer.set(timer)
+    return timer
+
+
+def current_job() -> Optional[JobTimer]:
+    return _job_timer.get()
+
+
+def observe_span(name: str, seconds: float):
+    span_seconds.observe(seconds, span=name)
+    timer = _job_timer.get()
+    if timer is not None:
+        timer.add_span(name, seconds)
+
+
+def observe_stage(stage: str, seconds: float):
+    stage_seconds.observe(seconds, stage=stage)
+    timer = _job_timer.get()
+    if timer is not None:
+        timer.add_stage(stage, seconds)
+
+
+def count_tokens(kind: str, prompt: int, generated: int, cached_prompt: int = 0):
+    for token_type, amount in (("prompt", prompt), ("cached_prompt", cached_prompt), ("generated", generated)):
+        if amount:
+            llm_tokens.inc(amount, kind=kind, type=token_type)
+    timer = _job_timer.get()
+    if timer is not None:
+        timer.add_tokens("prompt", prompt)
+        timer.add_tokens("cached_prompt", cached_prompt)
+        timer.add_tokens("generated", generated)
+
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_span(name, time.perf_counter() - start)
+
+
+def render() -> str:
+    """
+    Every metric in the Prometheus text exposition format.
+    """
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
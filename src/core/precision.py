@@ -0,0 +1,39 @@
+import torch
+from src.core.logger import app_logger
+
+# auto: the checkpoint's own dtype. int8: dynamic quantization of nn.Linear on
+# CPU (weights int8, activations quantized per call), bitsandbytes 8-bit on CUDA.
+PRECISIONS = {"auto", "fp32", "bf16", "int8"}
+
+
+def check_precision(name: str, precision: str) -> str:
+    if precision not in PRECISIONS:
+        raise ValueError(f"{name} must be one of {sorted(PRECISIONS)}, got '{precision}'")
+    return precision
+
+
+def model_load_kwargs(precision: str) -> dict:
+    """
+    from_pretrained() arguments for a precision mode.
+    """
+    if precision == "fp32":
+        return {"dtype": torch.float32}
+    if precision == "bf16":
+        return {"dtype": torch.bfloat16}
+    if precision == "int8":
+        if torch.cuda.is_available():
+            from transformers import BitsAndBytesConfig
+            return {"quantization_config": BitsAndBytesConfig(load_in_8bit=True)}
+        # Dynamic quantization needs fp32 weights to start from.
+        return {"dtype": torch.float32}
+    return {"dtype": "auto"}
+
+
+def finalize_model(model: torch.nn.Module, precision: str) -> torch.nn.Module:
+    """
+    Applies the post-load step of a precision mode (CPU int8 quantization).
+    """
+    if precision == "int8" and not torch.cuda.is_available():
+        model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+        app_logger.info("Applied int8 dynamic quantization to linear layers")
+    return model
@@ -1,14 +1,24 @@
+import asyncio
 from fastapi import FastAPI
 from contextlib import asynccontextmanager
 from src.core.config import settings
 from src.core.logger import app_logger
+from src.core.lifecycle import warm_up_all
 from src.api.routes import router as api_router
+from src.modules.vision import vision_engine
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     app_logger.info("Service is starting up...")
+    # Models load on first use; warming them in the background lets the server
+    # bind right away while /ready reports progress.
+    warmup = asyncio.create_task(asyncio.to_thread(warm_up_all)) if settings.MODEL_WARMUP else None
     yield
     app_logger.info("Service is shutting down...")
+    if warmup is not None:
+        # The loader thread cannot be interrupted; let it finish before the OCR pool closes.
+        await warmup
+    vision_engine.shutdown()
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
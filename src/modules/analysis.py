@@ -1,36 +1,106 @@
 import torch
+import copy
 import json
 import re
+import random
 import asyncio
-from typing import List, Dict, Union
-from transformers import AutoModelForCausalLM, AutoTokenizer
+from typing import Callable, List, Dict, Optional, Tuple, Union
+from transformers import AutoModelForCausalLM, AutoTokenizer, DynamicCache, LogitsProcessorList, StoppingCriteriaList
 from src.core.config import settings
 from src.core.logger import app_logger
+from src.core.cache import DiskCache, sha256_text
+from src.core.lifecycle import Component, register
+from src.core.metrics import count_tokens, span
+from src.core.precision import check_precision, finalize_model, model_load_kwargs
 from src.api.schemas import CandidateResult
+from src.modules.decoding import (
+    JSONDecodingState,
+    JSONStoppingCriteria,
+    SchemaKeysLogitsProcessor,
+    TokenTable,
+    extract_json,
+)
 
-class LLMRanker:
-    def __init__(self):
+# Stand-in for the resume context when splitting the extraction prompt.
+CONTEXT_SLOT = "\x00RESUME_CONTEXT\x00"
+
+# (prefix token ids, KV cache after prefilling them, prompt text that follows the context)
+PromptPrefix = Tuple[torch.Tensor, DynamicCache, str]
+
+# Top-level keys each prompt asks for; enforced when structured decoding is on.
+EXTRACTION_KEYS = ("skills", "experience", "score", "reasoning")
+JUDGE_KEYS = ("rankings",)
+
+# Label of each generate call in the metrics, by the schema it decodes.
+GENERATE_KINDS = {EXTRACTION_KEYS: "extraction", JUDGE_KEYS: "judge"}
+
+# Output budget per roster entry in a judge call.
+JUDGE_TOKENS_PER_CANDIDATE = 160
+
+class LLMRanker(Component):
+    name = "llm"
+
+    def __init__(self, precision: Optional[str] = None):
+        super().__init__()
         self.device = "cuda" if torch.cuda.is_available() else "cpu"
-        app_logger.info(f"Loading LLM on {self.device} (Lazy Loading)...")
+        self.precision = check_precision("LLM_PRECISION", precision or settings.LLM_PRECISION)
+        self._token_table: Optional[TokenTable] = None
+        self._cache: Optional[DiskCache] = None
+
+    def _load(self):
+        app_logger.info(f"Loading LLM on {self.device} ({self.precision})...")
         
         self.tokenizer = AutoTokenizer.from_pretrained(
             settings.LLM_MODEL_ID, 
             trust_remote_code=True
         )
+        # Batched generation needs left padding so every prompt ends at the same position.
+        self.tokenizer.padding_side = "left"
+        if self.tokenizer.pad_token is None:
+            self.tokenizer.pad_token = self.tokenizer.eos_token
 
-        self.model = AutoModelForCausalLM.from_pretrained(
+        self.model = finalize_model(AutoModelForCausalLM.from_pretrained(
             settings.LLM_MODEL_ID,
-            torch_dtype="auto",
             device_map="auto",
-            trust_remote_code=True
-        )
+            trust_remote_code=True,
+            **model_load_kwargs(self.precision)
+        ), self.precision)
 
-    async def rank_candidates(self, job_description: str, retrieved_chunks: list, full_docs_map: dict = None) -> list[CandidateResult]:
+    def _warmup(self):
+        # A short structured generation also builds the decoding token table.
+        prompt = self._render_prompt(self._build_extraction_messages("Python developer", "Python developer, 3 years."))
+        self._generate([prompt], max_new_tokens=8, schema_keys=EXTRACTION_KEYS)
+
+    @property
+    def cache(self) -> Optional[DiskCache]:
+        """
+        Stage-1 profiles from earlier jobs, opened on first use.
+        """
+        if self._cache is None and settings.EXTRACTION_CACHE_ENABLED:
+            self._cache = DiskCache(
+                settings.CACHE_DIR / "extraction.sqlite3",
+                max_bytes=settings.EXTRACTION_CACHE_MAX_BYTES,
+                ttl_seconds=settings.EXTRACTION_CACHE_TTL_SECONDS
+            )
+        return self._cache
+
+    async def rank_candidates(
+        self,
+        job_description: str,
+        retrieved_chunks: list,
+        full_docs_map: dict = None,
+        on_stage: Optional[Callable[..., None]] = None,
+        on_candidate: Optional[Callable[[CandidateResult], None]] = None
+    ) -> list[CandidateResult]:
         """
         Two-Stage Ranking:
         1. Parallel Extraction: Get details for every candidate.
         2. The Judge: Compare all candidates together to decide the final rank.
+        on_stage(stage, status, **detail) is told when "extraction" and "judging" start and finish.
+        on_candidate(candidate) gets each unranked, unscored profile as soon as
+        its extraction finishes, possibly from a worker thread.
         """
+        report = on_stage or (lambda stage, status, **detail: None)
         candidates_data = {}
         
         for item in retrieved_chunks:
@@ -38,8 +108,8 @@ class LLMRanker:
             if fname not in candidates_data: candidates_data[fname] = []
             candidates_data[fname].append(item['chunk']['content'])
 
-        extraction_tasks = []
         filenames = []
+        combined_contexts = []
         
         for filename, contexts in candidates_data.items():
             header_context = ""
@@ -50,39 +120,153 @@ class LLMRanker:
             combined_context = f"--- HEADER ---\n{header_context}\n\n--- EXPERIENCE ---\n{rag_context}"
             
             filenames.append(filename)
-            extraction_tasks.append(
-                asyncio.to_thread(self._analyze_single_candidate, job_description, combined_context)
-            )
+            combined_contexts.append(combined_context)
 
         app_logger.info(f"Stage 1: Extracting data for {len(filenames)} candidates...")
+        report("extraction", "running", candidates=len(filenames))
+
+        on_result = None
+        if on_candidate is not None:
+            on_result = lambda i, analysis: on_candidate(self._profile(filenames[i], analysis))
+
+        extracted_results = await self._extract(job_description, combined_contexts, on_result)
         
-        extracted_results = await asyncio.gather(*extraction_tasks)
-        
-        candidates = []
-        for fname, analysis in zip(filenames, extracted_results):
-            candidates.append(CandidateResult(
-                rank=0,
-                filename=fname,
-                score=0.0,
-                reasoning=analysis.get("reasoning", "Analysis failed"),
-                extracted_skills=analysis.get("skills", []),
-                relevant_experience=analysis.get("experience", [])
-            ))
+        report("extraction", "done", candidates=len(filenames))
+
+        candidates = [self._profile(fname, analysis) for fname, analysis in zip(filenames, extracted_results)]
 
         if len(candidates) > 1:
             app_logger.info("Stage 2: Running Comparative Judging...")
+            report("judging", "running", candidates=len(candidates))
             candidates = await asyncio.to_thread(self._judge_tournament, job_description, candidates)
+            report("judging", "done")
+        else:
+            report("judging", "skipped")
         
         candidates.sort(key=lambda x: x.score, reverse=True)
         for i, res in enumerate(candidates): res.rank = i + 1
             
         return candidates
 
+    def _profile(self, filename: str, analysis: dict) -> CandidateResult:
+        return CandidateResult(
+            rank=0,
+            filename=filename,
+            score=0.0,
+            reasoning=analysis.get("reasoning", "Analysis failed"),
+            extracted_skills=analysis.get("skills", []),
+            relevant_experience=analysis.get("experience", [])
+        )
+
     def _judge_tournament(self, jd: str, candidates: List[CandidateResult]) -> List[CandidateResult]:
         """
         Takes all extracted profiles and asks the LLM to re-score them
         relative to each other using a structured chat prompt.
+        Past JUDGE_GROUP_SIZE candidates, judging switches to bounded groups.
+        """
+        if 0 < settings.JUDGE_GROUP_SIZE < len(candidates):
+            verdicts = self._judge_hierarchical(jd, candidates)
+        else:
+            verdicts = self._judge_groups(jd, [candidates])[0]
+
+        # 3. Apply Scores
+        for cand, verdict in zip(candidates, verdicts):
+            if verdict is not None:
+                cand.score, cand.reasoning = verdict[0], verdict[1] or cand.reasoning
+
+        return candidates
+
+    def _judge_hierarchical(self, jd: str, candidates: List[CandidateResult]) -> List[Optional[Tuple[float, str]]]:
+        """
+        Judges seeded, fixed-size groups, then calibrates groups against each other:
+        each group's best candidate goes into a calibration round (itself grouped
+        recursively if needed) and the whole group is shifted by how much its
+        anchor's score moved. Every call sees at most JUDGE_GROUP_SIZE candidates,
+        so total cost grows linearly with the candidate count.
         """
+        # Groups of one would make every candidate its own anchor, so the
+        # calibration round would be as large as the input and never shrink.
+        group_size = max(2, settings.JUDGE_GROUP_SIZE)
+        order = list(range(len(candidates)))
+        random.Random(settings.JUDGE_SEED).shuffle(order)
+        groups = [order[i:i + group_size] for i in range(0, len(order), group_size)]
+
+        app_logger.info(f"Judging {len(candidates)} candidates in {len(groups)} groups of up to {group_size}")
+
+        verdicts: List[Optional[Tuple[float, str]]] = [None] * len(candidates)
+        group_verdicts = self._judge_groups(jd, [[candidates[i] for i in group] for group in groups])
+        for group, results in zip(groups, group_verdicts):
+            for i, verdict in zip(group, results):
+                verdicts[i] = verdict
+
+        anchors = [
+            max(group, key=lambda i: verdicts[i][0] if verdicts[i] is not None else -1.0)
+            for group in groups
+        ]
+        if len(anchors) == 1:
+            return verdicts
+
+        if len(anchors) > group_size:
+            calibrated = self._judge_hierarchical(jd, [candidates[i] for i in anchors])
+        else:
+            calibrated = self._judge_groups(jd, [[candidates[i] for i in anchors]])[0]
+
+        for group, anchor, anchor_verdict in zip(groups, anchors, calibrated):
+            if anchor_verdict is None or verdicts[anchor] is None:
+                continue
+            offset = anchor_verdict[0] - verdicts[anchor][0]
+            for i in group:
+                if verdicts[i] is not None:
+                    verdicts[i] = (min(1.0, max(0.0, verdicts[i][0] + offset)), verdicts[i][1])
+
+        return verdicts
+
+    def _judge_groups(self, jd: str, groups: List[List[CandidateResult]]) -> List[List[Optional[Tuple[float, str]]]]:
+        """
+        Runs one judge prompt per group, batched, and returns a
+        (score in 0-1, reason) verdict per candidate, or None if it was not ranked.
+        """
+        prompts = [self._render_prompt(self._build_judge_messages(jd, group)) for group in groups]
+        results: List[List[Optional[Tuple[float, str]]]] = []
+
+        for start in range(0, len(groups), settings.LLM_BATCH_SIZE):
+            batch = groups[start:start + settings.LLM_BATCH_SIZE]
+            max_new_tokens = min(5000, 64 + JUDGE_TOKENS_PER_CANDIDATE * max(len(group) for group in batch))
+            responses = self._generate(
+                prompts[start:start + len(batch)], max_new_tokens=max_new_tokens, schema_keys=JUDGE_KEYS
+            )
+            for group, response_text in zip(batch, responses):
+                results.append(self._parse_judge_output(response_text, group))
+
+        return results
+
+    def _parse_judge_output(self, response_text: str, candidates: List[CandidateResult]) -> List[Optional[Tuple[float, str]]]:
+        parsed_output = self._clean_and_parse_json(response_text)
+
+        if isinstance(parsed_output, list):
+            ranking_data = {"rankings": parsed_output}
+        elif isinstance(parsed_output, dict) and "rankings" in parsed_output:
+            ranking_data = parsed_output
+        else:
+            app_logger.error(f"Judge returned unknown schema: {parsed_output}")
+            return [None] * len(candidates)
+
+        rank_map = {r["filename"]: r for r in ranking_data["rankings"] if isinstance(r, dict) and "filename" in r}
+
+        verdicts = []
+        for cand in candidates:
+            match = rank_map.get(cand.filename)
+            if match is None:
+                verdicts.append(None)
+                continue
+            try:
+                score = float(match.get("final_score", 0)) / 100.0
+            except (TypeError, ValueError):
+                score = 0.0
+            verdicts.append((score, match.get("reason")))
+        return verdicts
+
+    def _build_judge_messages(self, jd: str, candidates: List[CandidateResult]) -> List[Dict]:
         roster_lines = []
         for i, c in enumerate(candidates):
             skills = ", ".join(c.extracted_skills[:5]) if c.extracted_skills else "N/A"
@@ -97,7 +281,7 @@ class LLMRanker:
 
         roster = "\n\n".join(roster_lines)
 
-        messages = [
+        return [
     {
         "role": "system",
         "content": (
@@ -151,50 +335,129 @@ Scoring Rules:
     }
 ]
 
+    async def _extract(
+        self,
+        jd: str,
+        contexts: List[str],
+        on_result: Optional[Callable[[int, dict], None]] = None
+    ) -> List[dict]:
+        """
+        Stage 1 with the extraction cache in front: only contexts without a
+        stored profile for this JD and model reach the LLM.
+        on_result(i, profile) is called for cache hits first, then for each
+        context as its generation batch finishes.
+        """
+        keys = [self._extraction_key(jd, context) for context in contexts] if self.cache is not None else []
+        results: List[Optional[dict]] = [None] * len(contexts)
+        if keys:
+            results = await asyncio.to_thread(lambda: [self.cache.get(key) for key in keys])
+
+        missing = [i for i, result in enumerate(results) if result is None]
+        pending = [contexts[i] for i in missing]
+
+        if on_result is not None:
+            for i, result in enumerate(results):
+                if result is not None:
+                    on_result(i, result)
+            # Indices below are into `pending`; map them back to `contexts`.
+            report = lambda j, result: on_result(missing[j], result)
+        else:
+            report = None
 
-        text = self.tokenizer.apply_chat_template(
-            messages,
-            tokenize=False,
-            add_generation_prompt=True,
-            enable_thinking=False
-        )
-
-        inputs = self.tokenizer(text, return_tensors="pt").to(self.model.device)
-
-        with torch.no_grad():
-            outputs = self.model.generate(
-                **inputs,
-                max_new_tokens=5000,
-                do_sample=False,
-                repetition_penalty=1.1
+        if not pending:
+            fresh = []
+        elif settings.LLM_BATCH_SIZE > 1:
+            fresh = await asyncio.to_thread(self._analyze_batch, jd, pending, report)
+        else:
+            prefix = None
+            if settings.LLM_PREFIX_CACHE:
+                prefix = await asyncio.to_thread(self._build_prompt_prefix, jd)
+
+            async def analyze(j: int, context: str) -> dict:
+                result = await asyncio.to_thread(self._analyze_single_candidate, jd, context, prefix)
+                if report is not None:
+                    report(j, result)
+                return result
+
+            fresh = await asyncio.gather(*[analyze(j, context) for j, context in enumerate(pending)])
+
+        for i, result in zip(missing, fresh):
+            results[i] = result
+
+        if keys:
+            # Failed parses are retried next time rather than remembered.
+            stored = [(keys[i], results[i]) for i in missing if isinstance(results[i], dict) and results[i]]
+            await asyncio.to_thread(lambda: [self.cache.set(key, value) for key, value in stored])
+
+            stats = self.cache.stats()
+            app_logger.info(
+                f"Extraction cache: {len(contexts) - len(missing)}/{len(contexts)} hits this job "
+                f"(lifetime hit rate {stats['hit_rate']:.0%}, {stats['entries']} entries)"
             )
+        return results
 
-        generated = outputs[0][inputs.input_ids.shape[1]:]
-        response_text = self.tokenizer.decode(generated, skip_special_tokens=True)
+    def _extraction_key(self, jd: str, context: str) -> str:
+        """
+        Hashes of the whitespace-normalised JD and the candidate context, plus
+        every setting that changes what the model would extract.
+        """
+        model_config = (
+            f"{settings.LLM_MODEL_ID}|precision={self.precision}"
+            f"|structured={settings.LLM_STRUCTURED_DECODING}"
+        )
+        normalized_jd = " ".join(jd.split())
+        return f"{sha256_text(normalized_jd)}:{sha256_text(context)}:{sha256_text(model_config)}"
+
+    def _analyze_single_candidate(self, jd: str, context: str, prefix: Optional[PromptPrefix] = None) -> dict:
+        if prefix is not None:
+            response_text = self._generate(
+                [context + prefix[2]], max_new_tokens=1000, prefix=prefix, schema_keys=EXTRACTION_KEYS
+            )[0]
+        else:
+            text = self._render_prompt(self._build_extraction_messages(jd, context))
+            response_text = self._generate([text], max_new_tokens=1000, schema_keys=EXTRACTION_KEYS)[0]
+        app_logger.debug(f"RAW JUDGE OUTPUT:\n{response_text}") 
 
-        parsed_output = self._clean_and_parse_json(response_text)
+        return self._clean_and_parse_json(response_text)
 
-        if isinstance(parsed_output, list):
-            ranking_data = {"rankings": parsed_output}
-        elif isinstance(parsed_output, dict) and "rankings" in parsed_output:
-            ranking_data = parsed_output
+    def _analyze_batch(
+        self,
+        jd: str,
+        contexts: List[str],
+        on_result: Optional[Callable[[int, dict], None]] = None
+    ) -> List[dict]:
+        """
+        Stage 1 for many candidates at once: prompts are length-sorted so each
+        batch pads as little as possible, then results are put back in order.
+        on_result(i, profile) is called as each batch finishes.
+        """
+        prefix = None
+        if settings.LLM_PREFIX_CACHE and contexts:
+            prefix = self._build_prompt_prefix(jd)
+            prompts = [context + prefix[2] for context in contexts]
         else:
-            app_logger.error(f"Judge returned unknown schema: {parsed_output}")
-            return candidates
+            prompts = [self._render_prompt(self._build_extraction_messages(jd, context)) for context in contexts]
+        lengths = [len(ids) for ids in self.tokenizer(prompts).input_ids]
+        order = sorted(range(len(prompts)), key=lambda i: lengths[i])
 
-        # 3. Apply Scores
-        rank_map = {r["filename"]: r for r in ranking_data["rankings"] if "filename" in r}
-        
-        for cand in candidates:
-            if cand.filename in rank_map:
-                match = rank_map[cand.filename]
-                cand.score = float(match.get("final_score", 0)) / 100.0
-                cand.reasoning = match.get("reason", cand.reasoning)
+        results: List[dict] = [{} for _ in prompts]
+        batch_size = settings.LLM_BATCH_SIZE
 
-        return candidates
+        for start in range(0, len(order), batch_size):
+            batch = order[start:start + batch_size]
+            responses = self._generate(
+                [prompts[i] for i in batch], max_new_tokens=1000, prefix=prefix, schema_keys=EXTRACTION_KEYS
+            )
+            for i, response_text in zip(batch, responses):
+                app_logger.debug(f"RAW JUDGE OUTPUT:\n{response_text}")
+                results[i] = self._clean_and_parse_json(response_text)
+                if on_result is not None:
+                    on_result(i, results[i])
+
+        return results
 
-    def _analyze_single_candidate(self, jd: str, context: str) -> dict:
-        messages = [
+    def _build_extraction_messages(self, jd: str, context: str) -> List[Dict]:
+        return [
             {
                 "role": "system",
                 "content": (
@@ -223,28 +486,101 @@ Scoring Rules:
             }
         ]
 
-        text = self.tokenizer.apply_chat_template(
+    def _build_prompt_prefix(self, jd: str) -> PromptPrefix:
+        """
+        Everything before the resume context (system message, chat template,
+        job description) is identical for every candidate of a job, so it is
+        prefilled once and its KV cache is reused for each continuation.
+        """
+        text = self._render_prompt(self._build_extraction_messages(jd, CONTEXT_SLOT))
+        prefix_text, suffix_text = text.split(CONTEXT_SLOT)
+
+        prefix_ids = self.tokenizer(prefix_text, return_tensors="pt").input_ids.to(self.model.device)
+        cache = DynamicCache()
+        # Only the KV cache is kept; one logits row instead of one per prefix token.
+        with torch.no_grad():
+            self.model(input_ids=prefix_ids, past_key_values=cache, use_cache=True, logits_to_keep=1)
+
+        return prefix_ids, cache, suffix_text
+
+    def _render_prompt(self, messages: List[Dict]) -> str:
+        return self.tokenizer.apply_chat_template(
             messages,
             tokenize=False,
             add_generation_prompt=True,
             enable_thinking=False
         )
 
-        inputs = self.tokenizer(text, return_tensors="pt").to(self.model.device)
+    def _generate(
+        self,
+        prompts: List[str],
+        max_new_tokens: int,
+        prefix: Optional[PromptPrefix] = None,
+        schema_keys: Optional[Tuple[str, ...]] = None
+    ) -> List[str]:
+        """
+        Greedy generation for a left-padded batch of rendered prompts.
+        With a prefix, prompts are only the text after it and the prefix KV cache
+        is copied per batch instead of being recomputed.
+        With schema keys (and LLM_STRUCTURED_DECODING on), output is held to a JSON
+        object with exactly those top-level keys and each row stops at its closing brace.
+        Returns only the newly generated text for each prompt.
+        """
+        past_key_values = None
 
-        with torch.no_grad():
+        if prefix is None:
+            inputs = self.tokenizer(prompts, return_tensors="pt", padding=True).to(self.model.device)
+            input_ids, attention_mask = inputs.input_ids, inputs.attention_mask
+        else:
+            prefix_ids, prefix_cache, _ = prefix
+            inputs = self.tokenizer(
+                prompts, return_tensors="pt", padding=True, add_special_tokens=False
+            ).to(self.model.device)
+
+            # Padding sits between prefix and continuation; the attention mask hides it
+            # and position ids are derived from the mask, so the cached positions still line up.
+            batch = len(prompts)
+            input_ids = torch.cat([prefix_ids.expand(batch, -1), inputs.input_ids], dim=1)
+            attention_mask = torch.cat([torch.ones_like(prefix_ids).expand(batch, -1), inputs.attention_mask], dim=1)
+
+            past_key_values = copy.deepcopy(prefix_cache)
+            if batch > 1:
+                past_key_values.batch_repeat_interleave(batch)
+
+        logits_processor = LogitsProcessorList()
+        stopping_criteria = StoppingCriteriaList()
+        if schema_keys and settings.LLM_STRUCTURED_DECODING:
+            state = JSONDecodingState(self._get_token_table(), schema_keys, len(prompts), input_ids.shape[1])
+            logits_processor.append(SchemaKeysLogitsProcessor(state))
+            stopping_criteria.append(JSONStoppingCriteria(state))
+
+        kind = GENERATE_KINDS.get(schema_keys, "other")
+        with span(f"llm.generate.{kind}"), torch.no_grad():
             outputs = self.model.generate(
-                **inputs,
-                max_new_tokens=1000,
+                input_ids=input_ids,
+                attention_mask=attention_mask,
+                past_key_values=past_key_values,
+                max_new_tokens=max_new_tokens,
                 do_sample=False,
-                repetition_penalty=1.1
+                repetition_penalty=1.1,
+                pad_token_id=self.tokenizer.pad_token_id,
+                logits_processor=logits_processor,
+                stopping_criteria=stopping_criteria
             )
 
-        generated = outputs[0][inputs.input_ids.shape[1]:]
-        response_text = self.tokenizer.decode(generated, skip_special_tokens=True)
-        app_logger.debug(f"RAW JUDGE OUTPUT:\n{response_text}") 
+        generated = outputs[:, input_ids.shape[1]:]
+        count_tokens(
+            kind,
+            prompt=int(attention_mask.sum()),
+            generated=int((generated != self.tokenizer.pad_token_id).sum()),
+            cached_prompt=0 if prefix is None else prefix[0].shape[1] * len(prompts)
+        )
+        return self.tokenizer.batch_decode(generated, skip_special_tokens=True)
 
-        return self._clean_and_parse_json(response_text)
+    def _get_token_table(self) -> TokenTable:
+        if self._token_table is None:
+            self._token_table = TokenTable(self.tokenizer)
+        return self._token_table
 
     def _clean_and_parse_json(self, text: str) -> Union[dict, list]:
         """
@@ -253,12 +589,38 @@ Scoring Rules:
         text = re.sub(r'<think>.*?</think>', '', text, flags=re.DOTALL).strip()
         text = text.replace("```json", "").replace("```", "").strip()
 
-        match = re.search(r'(\{[\s\S]*\}|\[[\s\S]*\])', text)
+        json_str = None
+        if settings.LLM_STRUCTURED_DECODING:
+            # Usually stops on the closing brace; a max_new_tokens cut-off
+            # leaves it open and falls through to the repair below.
+            json_str = extract_json(text)
+        if json_str is None:
+            json_str = self._repair_json(text)
 
-        if not match:
+        if json_str is None:
             app_logger.error(f"No JSON found. Raw output: {text[:50]}...")
             return {}
 
+        try:
+            return json.loads(json_str)
+        except json.JSONDecodeError:
+            json_str = re.sub(r',\s*}', '}', json_str)
+            json_str = re.sub(r',\s*]', ']', json_str)
+            try:
+                return json.loads(json_str)
+            except:
+                app_logger.error("Final JSON decode failed.")
+                return {}
+
+    def _repair_json(self, text: str) -> Optional[str]:
+        """
+        Free-form fallback: grab the outermost braces and close any left open.
+        """
+        match = re.search(r'(\{[\s\S]*\}|\[[\s\S]*\])', text)
+
+        if not match:
+            return None
+
         json_str = match.group(0)
 
         if json_str.startswith("{"):
@@ -270,15 +632,6 @@ Scoring Rules:
             close_brackets = json_str.count(']')
             if close_brackets < open_brackets: json_str += ']' * (open_brackets - close_brackets)
 
-        try:
-            return json.loads(json_str)
-        except json.JSONDecodeError:
-            json_str = re.sub(r',\s*}', '}', json_str)
-            json_str = re.sub(r',\s*]', ']', json_str)
-            try:
-                return json.loads(json_str)
-            except:
-                app_logger.error("Final JSON decode failed.")
-                return {}
+        return json_str
 
-llm_ranker = LLMRanker()
\ No newline at end of file
+llm_ranker = register(LLMRanker())
\ No newline at end of file
@@ -0,0 +1,327 @@
+import os
+import re
+import time
+import sqlite3
+import threading
+import numpy as np
+import faiss
+from pathlib import Path
+from collections import Counter
+from typing import List, Dict, Optional
+from fastapi import HTTPException
+from src.core.config import settings
+from src.core.logger import app_logger
+from src.core.metrics import span
+
+INDEX_TYPES = {"flat", "ivf", "hnsw"}
+CORPUS_NAME_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+# Training points per IVF list that FAISS asks for, and the fewest lists worth
+# leaving the flat index for.
+IVF_POINTS_PER_LIST = 39
+IVF_MIN_LISTS = 16
+
+
+class Corpus:
+    """
+    A named, persistent candidate pool: a FAISS index of chunk embeddings on disk
+    plus a SQLite store with the chunk text and the full OCR text per document.
+    FAISS ids are the chunk row ids, so documents can be added and removed
+    without rebuilding the index.
+    """
+
+    def __init__(self, name: str, directory: Path, dimension: int, index_type: str):
+        self.name = name
+        self.directory = directory
+        self.dimension = dimension
+        self._lock = threading.RLock()
+
+        directory.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(directory / "metadata.sqlite3"), check_same_thread=False)
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS documents ("
+            "doc_id TEXT PRIMARY KEY, text TEXT NOT NULL, path TEXT, added_at REAL NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS chunks ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, doc_id TEXT NOT NULL, content TEXT NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS idx_chunks_doc ON chunks (doc_id);"
+        )
+        self._conn.execute("INSERT OR IGNORE INTO settings VALUES ('index_type', ?)", (index_type,))
+        self._conn.commit()
+        self.index_type = self._conn.execute("SELECT value FROM settings WHERE key = 'index_type'").fetchone()[0]
+
+        self._index_path = directory / "index.faiss"
+        self.index: Optional[faiss.Index] = None
+        self._load_index()
+
+    def add_documents(self, documents: List[Dict], embeddings: np.ndarray, chunked_docs: List[Dict]) -> List[str]:
+        """
+        documents: OCR results; embeddings/chunked_docs: RAGEngine.embed_documents output.
+        A document whose filename is already in the corpus is replaced.
+        All or nothing: on failure the metadata and the index are left as they were.
+        """
+        doc_ids = [doc["filename"] for doc in documents]
+        duplicates = sorted(doc_id for doc_id, count in Counter(doc_ids).items() if count > 1)
+        if duplicates:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Duplicate filenames in upload (corpus documents are keyed by filename): {', '.join(duplicates)}"
+            )
+
+        with self._lock:
+            try:
+                for doc_id in doc_ids:
+                    self._remove(doc_id)
+
+                now = time.time()
+                self._conn.executemany(
+                    "INSERT INTO documents (doc_id, text, path, added_at) VALUES (?, ?, ?, ?)",
+                    [(doc["filename"], doc["text"], doc.get("path"), now) for doc in documents]
+                )
+
+                ids = []
+                for chunk in chunked_docs:
+                    cursor = self._conn.execute(
+                        "INSERT INTO chunks (doc_id, content) VALUES (?, ?)",
+                        (chunk["filename"], chunk["content"])
+                    )
+                    ids.append(cursor.lastrowid)
+
+                if ids:
+                    vectors = np.ascontiguousarray(embeddings, dtype=np.float32)
+                    self._ensure_index()
+                    self.index.add_with_ids(vectors, np.asarray(ids, dtype=np.int64))
+                    self._grow_ivf()
+
+                self._conn.commit()
+            except Exception:
+                self._rollback()
+                raise
+            self._save_index()
+
+        app_logger.info(f"Corpus {self.name}: added {len(doc_ids)} documents ({len(ids)} chunks)")
+        return doc_ids
+
+    def remove_document(self, doc_id: str) -> bool:
+        with self._lock:
+            try:
+                removed = self._remove(doc_id)
+                self._conn.commit()
+            except Exception:
+                self._rollback()
+                raise
+            if removed:
+                self._save_index()
+        return removed
+
+    def search(self, query_vec: np.ndarray, k: int) -> List[Dict]:
+        """
+        Same result shape as RAGEngine.search.
+        """
+        with self._lock:
+            if self.index is None or self.index.ntotal == 0:
+                return []
+
+            # HNSW cannot delete, so removed chunks may still come back: fetch
+            # more until k of them are live or the whole index has been seen.
+            query = np.ascontiguousarray(query_vec, dtype=np.float32)
+            fetch = min(self.index.ntotal, k * 2)
+            while True:
+                with span("retrieval.dense"):
+                    distances, indices = self.index.search(query, fetch)
+
+                hits = [(int(idx), float(score)) for idx, score in zip(indices[0], distances[0]) if idx != -1]
+                rows = self._fetch_chunks([idx for idx, _ in hits])
+                if len(rows) >= k or fetch >= self.index.ntotal:
+                    break
+                fetch = min(self.index.ntotal, fetch * 2)
+
+        results = []
+        for idx, score in hits:
+            chunk = rows.get(idx)
+            if chunk is None:
+                continue
+            results.append({"score": score, "dense_score": score, "chunk": chunk})
+            if len(results) == k:
+                break
+        return results
+
+    def full_text_map(self, filenames: List[str]) -> Dict[str, str]:
+        if not filenames:
+            return {}
+        with self._lock:
+            placeholders = ",".join("?" * len(filenames))
+            rows = self._conn.execute(
+                f"SELECT doc_id, text FROM documents WHERE doc_id IN ({placeholders})", filenames
+            ).fetchall()
+        return dict(rows)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            documents = self._conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+            chunks = self._conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+            vectors = self.index.ntotal if self.index is not None else 0
+        return {
+            "corpus": self.name,
+            "index_type": self.index_type,
+            "documents": documents,
+            "chunks": chunks,
+            "vectors": vectors,
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _remove(self, doc_id: str) -> bool:
+        """
+        Caller must hold the lock and commit.
+        """
+        ids = [row[0] for row in self._conn.execute("SELECT id FROM chunks WHERE doc_id = ?", (doc_id,))]
+        deleted = self._conn.execute("DELETE FROM documents WHERE doc_id = ?", (doc_id,)).rowcount
+        self._conn.execute("DELETE FROM chunks WHERE doc_id = ?", (doc_id,))
+
+        if ids and self.index is not None:
+            if self.index_type == "hnsw":
+                # HNSW graphs do not support removal; the orphaned vectors are
+                # skipped at search time because their metadata rows are gone.
+                app_logger.info(f"Corpus {self.name}: {len(ids)} vectors of {doc_id} stay in the HNSW graph, unsearchable")
+            else:
+                self.index.remove_ids(np.asarray(ids, dtype=np.int64))
+
+        return deleted > 0
+
+    def _rollback(self):
+        """
+        Undoes an unfinished write: the SQLite transaction is rolled back and
+        the in-memory index, which may have lost or gained vectors, is reloaded
+        from its last saved copy.
+        """
+        self._conn.rollback()
+        self._load_index()
+        app_logger.warning(f"Corpus {self.name}: write failed, rolled back")
+
+    def _load_index(self):
+        self.index = faiss.read_index(str(self._index_path)) if self._index_path.exists() else None
+        self._configure_search()
+
+    def _fetch_chunks(self, ids: List[int]) -> Dict[int, Dict]:
+        if not ids:
+            return {}
+        placeholders = ",".join("?" * len(ids))
+        rows = self._conn.execute(
+            f"SELECT c.id, c.doc_id, c.content, d.path FROM chunks c "
+            f"JOIN documents d ON d.doc_id = c.doc_id WHERE c.id IN ({placeholders})", ids
+        ).fetchall()
+        return {
+            row[0]: {"filename": row[1], "content": row[2], "full_path": row[3]}
+            for row in rows
+        }
+
+    def _ensure_index(self):
+        """
+        Builds the index on first add. IVF corpora start out flat; see _grow_ivf.
+        """
+        if self.index is not None:
+            return
+
+        if self.index_type == "hnsw":
+            base = faiss.IndexHNSWFlat(self.dimension, settings.CORPUS_HNSW_M, faiss.METRIC_INNER_PRODUCT)
+            self.index = faiss.IndexIDMap2(base)
+        else:
+            self.index = faiss.IndexIDMap2(faiss.IndexFlatIP(self.dimension))
+
+        self._configure_search()
+
+    def _grow_ivf(self):
+        """
+        Moves an IVF corpus from its flat start to IVF once there are enough
+        vectors to train IVF_MIN_LISTS lists, then retrains on every vector each
+        time the corpus supports twice as many lists, up to CORPUS_IVF_NLIST.
+        Doubling keeps the total retraining cost linear in the corpus size.
+        Caller must hold the lock.
+        """
+        if self.index_type != "ivf":
+            return
+
+        target = min(settings.CORPUS_IVF_NLIST, self.index.ntotal // IVF_POINTS_PER_LIST)
+        ivf = faiss.try_extract_index_ivf(self.index)
+        current = ivf.nlist if ivf is not None else 0
+        if target < IVF_MIN_LISTS or target <= current:
+            return
+        if target < 2 * current and target < settings.CORPUS_IVF_NLIST:
+            return
+
+        ids = np.asarray([row[0] for row in self._conn.execute("SELECT id FROM chunks ORDER BY id")], dtype=np.int64)
+        if ivf is not None:
+            # Vectors are looked up by chunk id.
+            ivf.set_direct_map_type(faiss.DirectMap.Hashtable)
+        vectors = self.index.reconstruct_batch(ids)
+
+        with span("indexing.faiss"):
+            quantizer = faiss.IndexFlatIP(self.dimension)
+            index = faiss.IndexIVFFlat(quantizer, self.dimension, target, faiss.METRIC_INNER_PRODUCT)
+            index.train(vectors)
+            index.add_with_ids(vectors, ids)
+        self.index = index
+        self._configure_search()
+        app_logger.info(f"Corpus {self.name}: trained IVF index with {target} lists on {len(ids)} vectors")
+
+    def _configure_search(self):
+        if self.index is None:
+            return
+        if self.index_type == "ivf":
+            # None while the corpus is still too small for IVF.
+            ivf = faiss.try_extract_index_ivf(self.index)
+            if ivf is not None:
+                ivf.nprobe = settings.CORPUS_IVF_NPROBE
+        elif self.index_type == "hnsw":
+            faiss.downcast_index(self.index.index).hnsw.efSearch = settings.CORPUS_HNSW_EF_SEARCH
+
+    def _save_index(self):
+        if self.index is None:
+            return
+        tmp_path = self._index_path.with_suffix(".tmp")
+        faiss.write_index(self.index, str(tmp_path))
+        os.replace(tmp_path, self._index_path)
+
+
+class CorpusManager:
+    def __init__(self):
+        self.root = settings.CORPUS_DIR
+        self._corpora: Dict[str, Corpus] = {}
+        self._lock = threading.Lock()
+
+    def get(self, name: str, dimension: int, index_type: Optional[str] = None, create: bool = False) -> Corpus:
+        """
+        Opens a corpus, creating it if `create` is set.
+        `index_type` only applies when the corpus is created.
+        """
+        index_type = self.validate(name, index_type)
+
+        with self._lock:
+            corpus = self._corpora.get(name)
+            if corpus is not None:
+                return corpus
+
+            directory = self.root / name
+            if not directory.exists() and not create:
+                raise HTTPException(status_code=404, detail=f"Corpus '{name}' not found")
+
+            corpus = Corpus(name, directory, dimension, index_type)
+            self._corpora[name] = corpus
+            return corpus
+
+    def validate(self, name: str, index_type: Optional[str] = None) -> str:
+        """
+        Checks a corpus name and index type without touching disk; returns the index type to use.
+        """
+        if not CORPUS_NAME_PATTERN.match(name):
+            raise HTTPException(status_code=400, detail="Corpus name must be 1-64 letters, digits, '-' or '_'")
+
+        index_type = index_type or settings.CORPUS_INDEX_TYPE
+        if index_type not in INDEX_TYPES:
+            raise HTTPException(status_code=400, detail=f"Unknown index type (choose from {sorted(INDEX_TYPES)})")
+        return index_type
+
+corpus_manager = CorpusManager()
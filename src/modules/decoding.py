@@ -0,0 +1,336 @@
+import re
+import json
+import torch
+from typing import List, Optional, Sequence
+from transformers import LogitsProcessor, StoppingCriteria
+
+JSON_WHITESPACE = " \t\n\r"
+# Whitespace allowed in a row while a structural token is expected.
+MAX_BLANK_RUN = 32
+# A quote or closing bracket followed by `}`: ends a string or nested value, then the object.
+LATE_CLOSE = re.compile(r'["\]}]\s*}')
+
+
+class JSONScanner:
+    """
+    Incremental character scanner for one top-level JSON object.
+    Tracks just enough state to know which schema keys are still missing,
+    whether a key or separator is expected next, and when the object closes.
+    """
+
+    def __init__(self, keys: Sequence[str]):
+        self.remaining = list(keys)
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+        self.done = False
+        # start | key | colon | value | primitive | nested | after_value
+        self.mode = "start"
+        self.key_text = ""
+        # Key just spelled; it only counts once its `:` follows.
+        self.pending_key = None
+        self.blank_run = 0
+
+    def feed(self, text: str):
+        for ch in text:
+            if self.done:
+                return
+            self._step(ch)
+
+    def _step(self, ch: str):
+        if not self.in_string:
+            self.blank_run = self.blank_run + 1 if ch in JSON_WHITESPACE else 0
+
+        if self.mode == "start":
+            if ch == "{":
+                self.depth = 1
+                self._expect_key()
+            return
+
+        if self.in_string:
+            if self.mode == "key":
+                self.key_text += ch
+            if self.escape:
+                self.escape = False
+            elif ch == "\\":
+                self.escape = True
+            elif ch == '"':
+                self.in_string = False
+                if self.mode == "key":
+                    self._finish_key()
+                elif self.mode == "value":
+                    self.mode = "after_value"
+            return
+
+        if self.mode == "key":
+            if ch == '"':
+                self.key_text += ch
+                self.in_string = True
+            elif ch == "}":
+                self._close()
+            else:
+                self.key_text += ch
+        elif self.mode == "colon":
+            if ch == ":":
+                if self.pending_key in self.remaining:
+                    self.remaining.remove(self.pending_key)
+                self.mode = "value"
+            elif not ch.isspace():
+                # Anything but whitespace before the colon: the key is not taken,
+                # and the character is read as the start of a value.
+                self.mode = "value"
+                self._step(ch)
+        elif self.mode == "value":
+            if ch == '"':
+                self.in_string = True
+            elif ch in "{[":
+                self.depth += 1
+                self.mode = "nested"
+            elif not ch.isspace():
+                self.mode = "primitive"
+        elif self.mode == "primitive":
+            if ch == ",":
+                self._expect_key()
+            elif ch == "}":
+                self._close()
+        elif self.mode == "nested":
+            if ch == '"':
+                self.in_string = True
+            elif ch in "{[":
+                self.depth += 1
+            elif ch in "}]":
+                self.depth -= 1
+                if self.depth == 1:
+                    self.mode = "after_value"
+        elif self.mode == "after_value":
+            if ch == ",":
+                self._expect_key()
+            elif ch == "}":
+                self._close()
+
+    def _expect_key(self):
+        self.mode = "key"
+        self.key_text = ""
+
+    def _finish_key(self):
+        try:
+            key = json.loads(self.key_text.strip())
+        except json.JSONDecodeError:
+            key = None
+        self.pending_key = key
+        self.mode = "colon"
+
+    def _close(self):
+        # The object only counts as finished once every schema key is in it.
+        if self.remaining:
+            return
+        self.depth = 0
+        self.done = True
+
+
+class TokenTable:
+    """
+    Decoded text of every vocabulary entry plus cached allow-masks,
+    built once per tokenizer.
+    """
+
+    def __init__(self, tokenizer):
+        size = len(tokenizer)
+        self.strings: List[str] = tokenizer.batch_decode([[i] for i in range(size)])
+        self.special_ids = set(tokenizer.all_special_ids)
+        for i in self.special_ids:
+            if i < size:
+                self.strings[i] = ""
+        self.stripped = [s.lstrip(JSON_WHITESPACE) for s in self.strings]
+        self._masks: dict = {}
+
+    def allow(self, name: str, predicate) -> torch.Tensor:
+        mask = self._masks.get(name)
+        if mask is None:
+            mask = torch.tensor([
+                i not in self.special_ids and predicate(i)
+                for i in range(len(self.strings))
+            ], dtype=torch.bool)
+            self._masks[name] = mask
+        return mask
+
+    def blank_or_starting(self, prefix: str, allow_blank: bool = True, allow_close: bool = True) -> torch.Tensor:
+        """
+        Tokens starting with `prefix` (after whitespace, if allowed); without
+        `allow_close`, none of them may contain `}`.
+        """
+        def closes(i: int) -> bool:
+            return not allow_close and "}" in self.strings[i]
+
+        if not allow_blank:
+            return self.allow(
+                f"starts:{prefix}:{allow_close}",
+                lambda i: self.strings[i].startswith(prefix) and not closes(i)
+            )
+        return self.allow(
+            f"blank-or-starts:{prefix}:{allow_close}",
+            lambda i: (self.stripped[i] == "" or self.stripped[i].startswith(prefix)) and not closes(i)
+        )
+
+    def without_close(self) -> torch.Tensor:
+        return self.allow("no-close", lambda i: "}" not in self.strings[i])
+
+    def without_late_close(self) -> torch.Tensor:
+        """
+        Excludes tokens that could end the current string or nested value and
+        the object in one go, e.g. `"}` or `]}`.
+        """
+        return self.allow("no-late-close", lambda i: LATE_CLOSE.search(self.strings[i]) is None)
+
+    def key_continuations(self, remaining: Sequence[str], key_text: str, allow_blank: bool = True) -> torch.Tensor:
+        """
+        Tokens that keep `key_text` on track to spell one of the remaining keys
+        (tokens may run past the closing quote, e.g. `"skills": [`, but only
+        into whitespace and the colon).
+        """
+        targets = [json.dumps(key) for key in remaining]
+        typed = key_text.lstrip(JSON_WHITESPACE)
+
+        def follows_key(candidate: str, target: str) -> bool:
+            if not candidate.startswith(target):
+                return False
+            rest = candidate[len(target):].lstrip(JSON_WHITESPACE)
+            return rest == "" or rest.startswith(":")
+
+        def compatible(i: int) -> bool:
+            if not allow_blank and typed == "":
+                candidate = self.strings[i]
+            else:
+                candidate = (typed + self.strings[i]).lstrip(JSON_WHITESPACE)
+            if candidate == "":
+                return allow_blank
+            return any(t.startswith(candidate) or follows_key(candidate, t) for t in targets)
+
+        return self.allow(f"key:{'|'.join(targets)}:{typed}:{allow_blank}", compatible)
+
+
+class JSONDecodingState:
+    """
+    Per-batch scanners shared by the logits processor and the stopping criterion.
+    Both are handed the full `input_ids` each step; new tokens are fed exactly once.
+    """
+
+    def __init__(self, table: TokenTable, keys: Sequence[str], batch_size: int, prompt_length: int):
+        self.table = table
+        self.scanners = [JSONScanner(keys) for _ in range(batch_size)]
+        self.consumed = prompt_length
+
+    def update(self, input_ids: torch.LongTensor):
+        length = input_ids.shape[1]
+        if length <= self.consumed:
+            return
+        new_tokens = input_ids[:, self.consumed:length].tolist()
+        for scanner, tokens in zip(self.scanners, new_tokens):
+            for token in tokens:
+                if token < len(self.table.strings):
+                    scanner.feed(self.table.strings[token])
+        self.consumed = length
+
+    def allowed(self, scanner: JSONScanner) -> Optional[torch.Tensor]:
+        """
+        Allow-mask for the next token of one row, or None when unconstrained.
+        """
+        if scanner.done:
+            return None
+        allow_blank = scanner.blank_run < MAX_BLANK_RUN
+        # While keys are missing, no token may close the object.
+        allow_close = not scanner.remaining
+        if scanner.mode == "start":
+            return self.table.blank_or_starting("{", allow_blank, allow_close)
+        if scanner.mode == "key" and not scanner.in_string and scanner.key_text.strip() == "" and not scanner.remaining:
+            return self.table.blank_or_starting("}", allow_blank)
+        if scanner.mode == "key":
+            return self.table.key_continuations(scanner.remaining, scanner.key_text, allow_blank)
+        if scanner.mode == "colon":
+            return self.table.blank_or_starting(":", allow_blank, allow_close)
+        if scanner.mode == "after_value":
+            return self.table.blank_or_starting("," if scanner.remaining else "}", allow_blank, allow_close)
+        if allow_close:
+            return None
+        # Values are left to the model, short of closing the object early.
+        if scanner.in_string or (scanner.mode == "nested" and scanner.depth == 2):
+            return self.table.without_late_close()
+        if scanner.mode in ("value", "primitive"):
+            return self.table.without_close()
+        return None
+
+
+class SchemaKeysLogitsProcessor(LogitsProcessor):
+    """
+    Forces output to open with `{`, to use only the expected top-level keys,
+    to emit every one of them (each followed by `:`), and to close once they
+    are all present.
+    Values themselves are left to the model.
+    """
+
+    def __init__(self, state: JSONDecodingState):
+        self.state = state
+
+    def __call__(self, input_ids: torch.LongTensor, scores: torch.FloatTensor) -> torch.FloatTensor:
+        self.state.update(input_ids)
+        for row, scanner in enumerate(self.state.scanners):
+            mask = self.state.allowed(scanner)
+            if mask is None:
+                continue
+            row_mask = torch.zeros(scores.shape[-1], dtype=torch.bool, device=scores.device)
+            size = min(len(mask), scores.shape[-1])
+            row_mask[:size] = mask[:size].to(scores.device)
+            scores[row] = scores[row].masked_fill(~row_mask, float("-inf"))
+        return scores
+
+
+class JSONStoppingCriteria(StoppingCriteria):
+    """
+    Finishes each row as soon as its top-level JSON object is balanced.
+    """
+
+    def __init__(self, state: JSONDecodingState):
+        self.state = state
+
+    def __call__(self, input_ids: torch.LongTensor, scores: torch.FloatTensor, **kwargs) -> torch.BoolTensor:
+        self.state.update(input_ids)
+        return torch.tensor(
+            [scanner.done for scanner in self.state.scanners],
+            dtype=torch.bool,
+            device=input_ids.device
+        )
+
+
+def extract_json(text: str) -> Optional[str]:
+    """
+    Returns the first balanced top-level JSON object or array in `text`.
+    """
+    start = None
+    depth = 0
+    in_string = False
+    escape = False
+
+    for i, ch in enumerate(text):
+        if start is None:
+            if ch in "{[":
+                start = i
+                depth = 1
+            continue
+
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch in "{[":
+            depth += 1
+        elif ch in "}]":
+            depth -= 1
+            if depth == 0:
+                return text[start:i + 1]
+
+    return None
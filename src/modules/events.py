@@ -0,0 +1,82 @@
+import json
+import asyncio
+from typing import AsyncIterator, Dict
+from src.api.schemas import CandidateResult
+from src.modules.pipeline import StageCallback
+from src.core.config import settings
+
+
+class JobEventStream:
+    """
+    One ranking job as a stream of events: every stage update (including each
+    document as its OCR finishes), each candidate as soon as its Stage-1
+    profile is extracted, then the judged result or the error.
+    Callbacks may fire from worker threads; events keep their order.
+    """
+
+    def __init__(self, sse: bool = False):
+        self.sse = sse
+        self._loop = asyncio.get_running_loop()
+        self._events: asyncio.Queue = asyncio.Queue()
+
+    @property
+    def media_type(self) -> str:
+        return "text/event-stream" if self.sse else "application/x-ndjson"
+
+    def emit(self, event: str, **data):
+        self._loop.call_soon_threadsafe(self._events.put_nowait, {"event": event, **data})
+
+    def forward(self, on_stage: StageCallback) -> StageCallback:
+        """
+        Wraps the job manager's stage callback so every update is also streamed.
+        """
+        def report(stage: str, status: str, **detail):
+            on_stage(stage, status, **detail)
+            self.emit("stage", stage=stage, status=status, detail=detail)
+        return report
+
+    def candidate(self, candidate: CandidateResult):
+        # Serialised now: the judge later rescores the same objects in place.
+        self.emit("candidate", candidate=candidate.model_dump(mode="json"))
+
+    async def stream(self, job: Dict, **opening) -> AsyncIterator[str]:
+        """
+        Yields encoded events until the job finishes, with a heartbeat whenever
+        nothing happened for STREAM_HEARTBEAT_SECONDS. The job keeps running if
+        the client goes away; its result stays available for polling.
+        """
+        yield self._encode({"event": "job", "job_id": job["job_id"], **opening})
+
+        task = job["task"]
+        timeout = settings.STREAM_HEARTBEAT_SECONDS if settings.STREAM_HEARTBEAT_SECONDS > 0 else None
+        getter = None
+        try:
+            while True:
+                if getter is None:
+                    getter = asyncio.ensure_future(self._events.get())
+                done, _ = await asyncio.wait({getter, task}, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if getter in done:
+                    yield self._encode(getter.result())
+                    getter = None
+                elif task in done:
+                    break
+                else:
+                    yield ": heartbeat\n\n" if self.sse else self._encode({"event": "heartbeat"})
+        finally:
+            if getter is not None:
+                getter.cancel()
+
+        # Events handed over by worker threads before the job returned.
+        while not self._events.empty():
+            yield self._encode(self._events.get_nowait())
+
+        if job["status"] == "failed":
+            yield self._encode({"event": "error", "status": job["error_status"], "detail": job["error"]})
+        else:
+            yield self._encode({"event": "result", "result": job["result"].model_dump(mode="json")})
+
+    def _encode(self, event: Dict) -> str:
+        data = json.dumps(event)
+        if self.sse:
+            return f"event: {event['event']}\ndata: {data}\n\n"
+        return data + "\n"
@@ -1,15 +1,42 @@
 import uuid
 import shutil
+import asyncio
 import zipfile
+from typing import BinaryIO, Optional
 from pathlib import Path
 from fastapi import UploadFile, HTTPException
 from src.core.config import settings
 from src.core.logger import app_logger
+from src.core.metrics import span
+from src.modules.vision import vision_engine
+
+class IngestedUpload:
+    """
+    A validated upload: zip members held in memory (streaming mode)
+    or a directory extracted under UPLOAD_DIR.
+    """
+    def __init__(self, members: Optional[list[tuple[str, bytes]]] = None, extract_path: Optional[Path] = None):
+        self.members = members
+        self.extract_path = extract_path
+
+    def cleanup(self):
+        if self.extract_path is not None:
+            shutil.rmtree(self.extract_path.parent, ignore_errors=True)
+            self.extract_path = None
+        self.members = None
 
 class IngestionService:
     def __init__(self):
         self.upload_dir = settings.UPLOAD_DIR
 
+    async def ingest(self, file: UploadFile) -> IngestedUpload:
+        """
+        Validates an upload using the configured ingestion mode (STREAM_INGESTION).
+        """
+        if settings.STREAM_INGESTION:
+            return IngestedUpload(members=await self.read_zip(file))
+        return IngestedUpload(extract_path=await self.process_zip(file))
+
     async def process_zip(self, file: UploadFile) -> Path:
         """
         Validates and extracts a Zip file to a unique temporary directory.
@@ -30,7 +57,8 @@ class IngestionService:
             raise HTTPException(status_code=500, detail="File upload failed")
         
         try:
-            self._validate_zip(zip_path)
+            with span("ingest.validate_zip"):
+                self._validate_zip(zip_path)
         except HTTPException as e:
             shutil.rmtree(session_dir)
             raise e
@@ -39,7 +67,7 @@ class IngestionService:
         extract_path.mkdir()
         
         try:
-            with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+            with span("ingest.extract"), zipfile.ZipFile(zip_path, 'r') as zip_ref:
                 zip_ref.extractall(extract_path)
         except Exception as e:
             shutil.rmtree(session_dir)
@@ -49,6 +77,61 @@ class IngestionService:
         app_logger.info(f"Successfully ingested session {session_id}")
         return extract_path
 
+    async def read_zip(self, file: UploadFile) -> list[tuple[str, bytes]]:
+        """
+        Streaming alternative to process_zip: validates the upload entry by entry
+        and returns (member name, bytes) pairs without touching the scratch disk.
+        """
+        with span("ingest.read_zip"):
+            members = await asyncio.to_thread(self._read_members, file.file)
+        app_logger.info(f"Successfully ingested {len(members)} files in memory")
+        return members
+
+    def _read_members(self, fileobj: BinaryIO) -> list[tuple[str, bytes]]:
+        fileobj.seek(0, 2)
+        if fileobj.tell() > settings.MAX_UPLOAD_SIZE_BYTES:
+            raise HTTPException(status_code=400, detail="Upload exceeds size limit")
+        fileobj.seek(0)
+
+        if not zipfile.is_zipfile(fileobj):
+            raise HTTPException(status_code=400, detail="File is not a valid zip archive")
+        fileobj.seek(0)
+
+        members = []
+        total_size = 0
+        total_files = 0
+
+        try:
+            with zipfile.ZipFile(fileobj, 'r') as zip_ref:
+                for info in zip_ref.infolist():
+                    total_files += 1
+                    total_size += info.file_size
+                    if not self._check_entry(info, total_files, total_size):
+                        continue
+
+                    members.append((info.filename, self._read_entry(zip_ref, info)))
+        except (zipfile.BadZipFile, OSError) as e:
+            app_logger.error(f"Extraction failed: {e}")
+            raise HTTPException(status_code=400, detail="Failed to extract zip file")
+
+        return members
+
+    def _read_entry(self, zip_ref: zipfile.ZipFile, info: zipfile.ZipInfo, block_size: int = 1 << 20) -> bytes:
+        """
+        Reads one member, refusing to inflate past the size its header declared.
+        """
+        buffer = bytearray()
+        with zip_ref.open(info) as member:
+            while True:
+                block = member.read(block_size)
+                if not block:
+                    break
+                buffer.extend(block)
+                if len(buffer) > info.file_size:
+                    app_logger.warning(f"Zip bomb detected: {info.filename} exceeds declared size")
+                    raise HTTPException(status_code=400, detail="Suspicious compression ratio detected")
+        return bytes(buffer)
+
     def _validate_zip(self, zip_path: Path):
         """
         Checks for Zip Bombs (Size, Ratio, File Count).
@@ -63,18 +146,27 @@ class IngestionService:
             for info in zip_ref.infolist():
                 total_files += 1
                 total_size += info.file_size
+                self._check_entry(info, total_files, total_size)
+
+    def _check_entry(self, info: zipfile.ZipInfo, total_files: int, total_size: int) -> bool:
+        """
+        Per-entry Zip Bomb limits, given the running totals including this entry.
+        Returns whether the entry is a document OCR can read; others (directories,
+        dotfiles, unsupported types) still count toward the limits but are never inflated.
+        """
+        if total_files > settings.MAX_FILE_COUNT:
+            raise HTTPException(status_code=400, detail=f"Too many files in zip (Limit: {settings.MAX_FILE_COUNT})")
 
-                if total_files > settings.MAX_FILE_COUNT:
-                    raise HTTPException(status_code=400, detail=f"Too many files in zip (Limit: {settings.MAX_FILE_COUNT})")
+        if total_size > settings.MAX_EXTRACTED_SIZE_BYTES:
+             raise HTTPException(status_code=400, detail="Total extracted size exceeds limit")
 
-                if total_size > settings.MAX_EXTRACTED_SIZE_BYTES:
-                     raise HTTPException(status_code=400, detail="Total extracted size exceeds limit")
 
+        if info.compress_size > 0:
+            ratio = info.file_size / info.compress_size
+            if ratio > 100:  # Threshold: 100x compression
+                app_logger.warning(f"Zip bomb detected: {info.filename} ratio {ratio:.2f}")
+                raise HTTPException(status_code=400, detail="Suspicious compression ratio detected")
 
-                if info.compress_size > 0:
-                    ratio = info.file_size / info.compress_size
-                    if ratio > 100:  # Threshold: 100x compression
-                        app_logger.warning(f"Zip bomb detected: {info.filename} ratio {ratio:.2f}")
-                        raise HTTPException(status_code=400, detail="Suspicious compression ratio detected")
+        return not info.is_dir() and vision_engine.is_supported(info.filename)
 
 ingestion_service = IngestionService()
\ No newline at end of file
@@ -0,0 +1,130 @@
+import time
+import asyncio
+from typing import Awaitable, Callable, Dict, Optional, Union
+from fastapi import HTTPException
+from src.api.schemas import BatchRankingResponse, CorpusIngestResponse, JobTimings, RankingResponse
+from src.modules.pipeline import STAGES, StageCallback
+from src.core.config import settings
+from src.core.logger import app_logger
+from src.core.metrics import current_job, job_queue_seconds, job_seconds, observe_stage, start_job
+
+JobResult = Union[RankingResponse, BatchRankingResponse, CorpusIngestResponse]
+JobWork = Callable[[StageCallback], Awaitable[JobResult]]
+
+
+class JobManager:
+    """
+    In-process registry for ranking and corpus ingestion jobs, with a bounded worker pool.
+    At most JOB_WORKERS jobs run at once and JOB_QUEUE_SIZE more may wait;
+    anything beyond that is refused with 429 instead of piling up.
+    """
+
+    def __init__(self):
+        self.jobs: Dict[str, Dict] = {}
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._pending = 0
+
+    def admit(self):
+        """
+        Fails fast before an upload is read when there is no room for another job.
+        """
+        if self._pending >= settings.JOB_WORKERS + settings.JOB_QUEUE_SIZE:
+            app_logger.warning(f"Rejecting job: {self._pending} jobs running or queued")
+            raise HTTPException(
+                status_code=429,
+                detail="Too many ranking jobs in progress, retry later",
+                headers={"Retry-After": str(settings.JOB_RETRY_AFTER_SECONDS)}
+            )
+
+    def submit(self, job_id: str, work: JobWork) -> Dict:
+        self.admit()
+        self._prune()
+
+        job = {
+            "job_id": job_id,
+            "status": "queued",
+            "stage": None,
+            "stages": {stage: {"status": "pending", "detail": {}} for stage in STAGES},
+            "created_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+            "error": None,
+            "error_status": None,
+            "result": None,
+        }
+        self.jobs[job_id] = job
+        self._pending += 1
+        job["task"] = asyncio.create_task(self._run(job, work))
+        return job
+
+    def get(self, job_id: str) -> Dict:
+        job = self.jobs.get(job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found")
+        return job
+
+    async def wait(self, job: Dict) -> JobResult:
+        """
+        Awaits a job and re-raises its failure as the HTTP error it would have produced.
+        """
+        await asyncio.shield(job["task"])
+        if job["status"] == "failed":
+            raise HTTPException(status_code=job["error_status"], detail=job["error"])
+        return job["result"]
+
+    async def _run(self, job: Dict, work: JobWork):
+        # Started by the route before ingestion when it wants that counted too.
+        timer = current_job() or start_job()
+        try:
+            async with self._get_slots():
+                job["status"] = "running"
+                job["started_at"] = time.time()
+                job_queue_seconds.observe(job["started_at"] - job["created_at"])
+                stage_started: Dict[tuple, float] = {}
+
+                def on_stage(stage: str, status: str, **detail):
+                    job["stage"] = stage
+                    job["stages"][stage] = {"status": status, "detail": detail}
+
+                    # Batch jobs run the per-JD stages once per job description.
+                    key = (stage, detail.get("job_description"))
+                    if status == "running":
+                        stage_started.setdefault(key, time.perf_counter())
+                    elif status == "done" and key in stage_started:
+                        observe_stage(stage, time.perf_counter() - stage_started.pop(key))
+
+                result = await work(on_stage)
+                if settings.JOB_TIMINGS:
+                    result.timings = JobTimings(**timer.snapshot())
+                job["result"] = result
+                job["status"] = "completed"
+        except HTTPException as e:
+            job["status"] = "failed"
+            job["error"] = e.detail
+            job["error_status"] = e.status_code
+        except Exception as e:
+            app_logger.exception(f"Job {job['job_id']} failed: {e}")
+            job["status"] = "failed"
+            job["error"] = "Internal error while ranking resumes"
+            job["error_status"] = 500
+        finally:
+            self._pending -= 1
+            job["finished_at"] = time.time()
+            job_seconds.observe(job["finished_at"] - job["created_at"], status=job["status"])
+
+    def _get_slots(self) -> asyncio.Semaphore:
+        # Created lazily so it binds to the running event loop.
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(settings.JOB_WORKERS)
+        return self._slots
+
+    def _prune(self):
+        cutoff = time.time() - settings.JOB_RESULT_TTL_SECONDS
+        expired = [
+            job_id for job_id, job in self.jobs.items()
+            if job["finished_at"] is not None and job["finished_at"] < cutoff
+        ]
+        for job_id in expired:
+            del self.jobs[job_id]
+
+job_manager = JobManager()
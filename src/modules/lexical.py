@@ -0,0 +1,106 @@
+import re
+import math
+import numpy as np
+from typing import Dict, List, Tuple
+
+# Lowercased alphanumeric runs; dotted names such as node.js or asp.net stay whole.
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:\.[a-z0-9]+)*")
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# (row in the chunk metadata, score), best first
+Hits = List[Tuple[int, float]]
+
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class BM25Index:
+    """
+    Compact inverted index over chunk texts. Postings are stored CSR-style in
+    three flat arrays (term offsets, chunk ids, precomputed BM25 weights), so a
+    query is a handful of array slices summed into one score vector.
+    """
+
+    def __init__(self, texts: List[str]):
+        self.size = len(texts)
+        self.vocabulary: Dict[str, int] = {}
+
+        term_ids = []
+        lengths = np.zeros(self.size, dtype=np.int64)
+        for i, text in enumerate(texts):
+            tokens = tokenize(text)
+            lengths[i] = len(tokens)
+            term_ids.extend(self.vocabulary.setdefault(token, len(self.vocabulary)) for token in tokens)
+
+        terms = np.asarray(term_ids, dtype=np.int64)
+        docs = np.repeat(np.arange(self.size, dtype=np.int64), lengths)
+
+        # One posting per (term, chunk); unique() sorts by term, then chunk.
+        pairs, tf = np.unique(terms * max(1, self.size) + docs, return_counts=True)
+        posting_terms = pairs // max(1, self.size)
+        self.doc_ids = (pairs % max(1, self.size)).astype(np.int32)
+
+        self.indptr = np.zeros(len(self.vocabulary) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(posting_terms, minlength=len(self.vocabulary)), out=self.indptr[1:])
+
+        df = np.diff(self.indptr)
+        idf = np.log1p((self.size - df + 0.5) / (df + 0.5))
+        avgdl = max(1.0, float(lengths.mean())) if self.size else 1.0
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths[self.doc_ids] / avgdl)
+        self.weights = (idf[posting_terms] * tf * (BM25_K1 + 1) / (tf + norm)).astype(np.float32)
+
+    @property
+    def nbytes(self) -> int:
+        return self.indptr.nbytes + self.doc_ids.nbytes + self.weights.nbytes
+
+    def search(self, query: str, k: int) -> Hits:
+        term_ids = {self.vocabulary[token] for token in tokenize(query) if token in self.vocabulary}
+        if not term_ids or k <= 0:
+            return []
+
+        scores = np.zeros(self.size, dtype=np.float32)
+        for term in term_ids:
+            start, end = self.indptr[term], self.indptr[term + 1]
+            np.add.at(scores, self.doc_ids[start:end], self.weights[start:end])
+
+        matched = np.flatnonzero(scores)
+        if len(matched) > k:
+            matched = matched[np.argpartition(-scores[matched], k - 1)[:k]]
+        matched = matched[np.argsort(-scores[matched], kind="stable")]
+        return [(int(i), float(scores[i])) for i in matched]
+
+
+def fuse(dense: Hits, lexical: Hits, k: int, method: str, dense_weight: float, rrf_k: int) -> Hits:
+    """
+    Merges two ranked hit lists.
+    rrf: sum of 1 / (rrf_k + rank) over the lists a hit appears in.
+    weighted: min-max normalised scores, dense_weight * dense + (1 - dense_weight) * lexical.
+    """
+    fused: Dict[int, float] = {}
+
+    if method == "weighted":
+        for hits, weight in ((dense, dense_weight), (lexical, 1 - dense_weight)):
+            if not hits:
+                continue
+            values = [score for _, score in hits]
+            low, span = min(values), max(values) - min(values)
+            for row, score in hits:
+                normalised = (score - low) / span if span > 0 else 1.0
+                fused[row] = fused.get(row, 0.0) + weight * normalised
+    else:
+        for hits in (dense, lexical):
+            for rank, (row, _) in enumerate(hits, 1):
+                fused[row] = fused.get(row, 0.0) + 1.0 / (rrf_k + rank)
+
+    ranked = sorted(fused.items(), key=lambda item: item[1], reverse=True)
+    return ranked[:k]
+
+
+def dense_share(k: int, ratio: float) -> int:
+    """
+    How many dense hits to fetch when lexical hits fill the rest of `k`.
+    """
+    return max(1, math.ceil(k * ratio))
@@ -0,0 +1,311 @@
+import queue
+import asyncio
+import threading
+from typing import Callable, Iterator, Optional
+from fastapi import HTTPException
+from src.api.schemas import BatchRankingResponse, CandidateResult, RankingResponse, SkippedCandidate
+from src.modules.ingestion import IngestedUpload
+from src.modules.vision import vision_engine
+from src.modules.rag import rag_engine, StreamingSearch
+from src.modules.reranker import chunk_reranker
+from src.modules.analysis import llm_ranker
+from src.core.config import settings
+from src.core.logger import app_logger
+
+STAGES = ("ocr", "indexing", "retrieval", "prefilter", "reranking", "extraction", "judging")
+
+# Marks the end of the OCR stream in the streaming pipeline.
+_END = object()
+
+# on_stage(stage, status, **detail) with status one of "running" | "done" | "skipped"
+StageCallback = Callable[..., None]
+
+# on_candidate(candidate) with a Stage-1 profile, before judging
+CandidateCallback = Callable[[CandidateResult], None]
+
+
+def _ignore_stage(stage: str, status: str, **detail):
+    pass
+
+
+class RankingPipeline:
+    """
+    OCR -> chunk/embed -> retrieval -> LLM ranking for one upload.
+    Blocking stages run in worker threads so the event loop stays responsive.
+
+    With PIPELINE_STREAMING, OCR and embedding overlap: documents go through a
+    bounded queue as they are OCR'd and are embedded in micro-batches into a
+    running top-k, so Tesseract and the embedding model work at the same time.
+    Stage 1 still starts once retrieval is final, because any later document
+    can push a candidate out of the top-k.
+    """
+
+    async def ocr(self, upload: IngestedUpload, on_stage: StageCallback = _ignore_stage) -> list[dict]:
+        on_stage("ocr", "running")
+
+        def read() -> list[dict]:
+            finished = []
+            for item in self._iter_ocr(upload):
+                finished.append(item)
+                on_stage("ocr", "running", documents=len(finished), filename=item[1]["filename"])
+            return [doc for _, doc in sorted(finished, key=lambda item: item[0])]
+
+        ocr_results = await asyncio.to_thread(read)
+
+        if not ocr_results:
+            raise HTTPException(status_code=400, detail="No readable text found in the uploaded resumes")
+
+        on_stage("ocr", "done", documents=len(ocr_results))
+        return ocr_results
+
+    async def run(
+        self,
+        job_id: str,
+        upload: IngestedUpload,
+        job_description: str,
+        top_k: int,
+        on_stage: Optional[StageCallback] = None,
+        on_candidate: Optional[CandidateCallback] = None
+    ) -> RankingResponse:
+        on_stage = on_stage or _ignore_stage
+
+        if settings.PIPELINE_STREAMING:
+            try:
+                ocr_results, (relevant_chunks,) = await self._ocr_and_retrieve(
+                    upload, [job_description], top_k * 5, on_stage
+                )
+            finally:
+                upload.cleanup()
+            app_logger.info(f"Job {job_id}: Successfully OCR'd {len(ocr_results)} documents.")
+        else:
+            try:
+                ocr_results = await self.ocr(upload, on_stage)
+            finally:
+                upload.cleanup()
+
+            app_logger.info(f"Job {job_id}: Successfully OCR'd {len(ocr_results)} documents.")
+
+            on_stage("indexing", "running")
+            index, chunk_metadata, lexical = await asyncio.to_thread(rag_engine.create_index, ocr_results)
+            on_stage("indexing", "done", chunks=len(chunk_metadata))
+
+            on_stage("retrieval", "running")
+            relevant_chunks = await asyncio.to_thread(
+                rag_engine.search, index, chunk_metadata, query=job_description, k=top_k * 5, lexical=lexical
+            )
+            on_stage("retrieval", "done", chunks=len(relevant_chunks))
+
+        full_text_map = {item['filename']: item['text'] for item in ocr_results}
+
+        return await self.rank(job_id, job_description, relevant_chunks, full_text_map, top_k, on_stage, on_candidate)
+
+    async def run_batch(
+        self,
+        job_id: str,
+        upload: IngestedUpload,
+        job_descriptions: list[str],
+        top_k: int,
+        on_stage: Optional[StageCallback] = None
+    ) -> BatchRankingResponse:
+        """
+        Ranks one upload against several job descriptions: OCR and indexing run
+        once, all JDs are embedded and searched together, and repeated JDs are
+        ranked once. Stage 1 itself is per JD, since the JD is part of every
+        extraction prompt. With PIPELINE_STREAMING, every JD keeps its own
+        running top-k while the documents stream through, as in run().
+        """
+        on_stage = on_stage or _ignore_stage
+        unique_jds = list(dict.fromkeys(job_descriptions))
+
+        if settings.PIPELINE_STREAMING:
+            try:
+                ocr_results, retrieved = await self._ocr_and_retrieve(upload, unique_jds, top_k * 5, on_stage)
+            finally:
+                upload.cleanup()
+            app_logger.info(f"Job {job_id}: Successfully OCR'd {len(ocr_results)} documents for {len(job_descriptions)} JDs.")
+        else:
+            try:
+                ocr_results = await self.ocr(upload, on_stage)
+            finally:
+                upload.cleanup()
+
+            app_logger.info(f"Job {job_id}: Successfully OCR'd {len(ocr_results)} documents for {len(job_descriptions)} JDs.")
+
+            on_stage("indexing", "running")
+            index, chunk_metadata, lexical = await asyncio.to_thread(rag_engine.create_index, ocr_results)
+            on_stage("indexing", "done", chunks=len(chunk_metadata))
+
+            on_stage("retrieval", "running", job_descriptions=len(unique_jds))
+            retrieved = await asyncio.to_thread(
+                rag_engine.search_many, index, chunk_metadata, unique_jds, top_k * 5, lexical
+            )
+            on_stage("retrieval", "done", job_descriptions=len(unique_jds))
+
+        full_text_map = {item['filename']: item['text'] for item in ocr_results}
+
+        rankings = {}
+        for n, (jd, relevant_chunks) in enumerate(zip(unique_jds, retrieved)):
+            def jd_stage(stage: str, status: str, **detail):
+                on_stage(stage, status, job_description=n, **detail)
+
+            rankings[jd] = await self.rank(
+                f"{job_id}-{n}", jd, relevant_chunks, full_text_map, top_k, jd_stage
+            )
+
+        return BatchRankingResponse(
+            job_id=job_id,
+            results=[rankings[jd] for jd in job_descriptions]
+        )
+
+    async def rank(
+        self,
+        job_id: str,
+        job_description: str,
+        relevant_chunks: list[dict],
+        full_text_map: dict,
+        top_k: int,
+        on_stage: Optional[StageCallback] = None,
+        on_candidate: Optional[CandidateCallback] = None
+    ) -> RankingResponse:
+        """
+        Stage 0 prefilter and chunk reranking, then the two LLM stages, over already retrieved chunks.
+        """
+        on_stage = on_stage or _ignore_stage
+
+        on_stage("prefilter", "running")
+        relevant_chunks, skipped = rag_engine.prefilter(
+            relevant_chunks, max(settings.PREFILTER_TOP_N, top_k) if settings.PREFILTER_TOP_N > 0 else 0
+        )
+        on_stage("prefilter", "done", skipped=len(skipped))
+
+        if chunk_reranker.enabled:
+            on_stage("reranking", "running", chunks=len(relevant_chunks))
+            relevant_chunks = await asyncio.to_thread(chunk_reranker.rerank, job_description, relevant_chunks)
+            on_stage("reranking", "done", chunks=len(relevant_chunks))
+        else:
+            on_stage("reranking", "skipped")
+
+        final_results = await llm_ranker.rank_candidates(
+            job_description,
+            relevant_chunks,
+            full_docs_map=full_text_map,
+            on_stage=on_stage,
+            on_candidate=on_candidate
+        )
+
+        return RankingResponse(
+            job_id=job_id,
+            candidates=final_results[:top_k],
+            skipped=[SkippedCandidate(filename=item["filename"], prefilter_score=item["score"]) for item in skipped]
+        )
+
+    async def _ocr_and_retrieve(
+        self,
+        upload: IngestedUpload,
+        job_descriptions: list[str],
+        k: int,
+        on_stage: StageCallback
+    ) -> tuple[list[dict], list[list[dict]]]:
+        """
+        Streaming OCR -> embed -> top-k for each JD. Returns (ocr_results,
+        relevant chunks per JD) with OCR results in upload order, as the
+        sequential path would.
+        """
+        documents: queue.Queue = queue.Queue(maxsize=max(1, settings.PIPELINE_QUEUE_SIZE))
+        stop = threading.Event()
+
+        def put(item) -> bool:
+            # Gives up when the consumer has failed, instead of blocking on a full queue.
+            while not stop.is_set():
+                try:
+                    documents.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def produce():
+            items = self._iter_ocr(upload)
+            try:
+                for n, item in enumerate(items, start=1):
+                    on_stage("ocr", "running", documents=n, filename=item[1]["filename"])
+                    if not put(item):
+                        return
+            finally:
+                # Closed here, not whenever it is collected, so its temp files are gone
+                # before the caller cleans the upload up.
+                items.close()
+                put(_END)
+
+        def consume() -> tuple[list[tuple[int, dict]], list[StreamingSearch], int]:
+            try:
+                searches = rag_engine.start_searches(job_descriptions, k)
+                ocr_results = []
+                chunks = 0
+                for batch in self._micro_batches(documents):
+                    ocr_results.extend(batch)
+                    embeddings, chunk_metadata = rag_engine.embed_documents([doc for _, doc in batch])
+                    for search in searches:
+                        search.add(embeddings, chunk_metadata)
+                    chunks += len(chunk_metadata)
+                    on_stage("indexing", "running", documents=len(ocr_results), chunks=chunks)
+                return ocr_results, searches, chunks
+            finally:
+                stop.set()
+
+        on_stage("ocr", "running")
+        on_stage("indexing", "running")
+        on_stage("retrieval", "running")
+        # Both threads are awaited even when one fails: the producer may still be
+        # reading the upload, which the caller deletes as soon as this raises.
+        produced, consumed = await asyncio.gather(
+            asyncio.to_thread(produce),
+            asyncio.to_thread(consume),
+            return_exceptions=True
+        )
+        for outcome in (consumed, produced):
+            if isinstance(outcome, BaseException):
+                raise outcome
+        ocr_results, searches, chunks = consumed
+
+        if not ocr_results:
+            raise HTTPException(status_code=400, detail="No readable text found in the uploaded resumes")
+
+        ocr_results = [doc for _, doc in sorted(ocr_results, key=lambda item: item[0])]
+        # Every search saw the same chunks, so one BM25 index serves them all.
+        lexical = searches[0].lexical_index()
+        retrieved = [search.results(lexical) for search in searches]
+
+        on_stage("ocr", "done", documents=len(ocr_results))
+        on_stage("indexing", "done", chunks=chunks)
+        on_stage("retrieval", "done", chunks=sum(len(relevant_chunks) for relevant_chunks in retrieved))
+        return ocr_results, retrieved
+
+    def _iter_ocr(self, upload: IngestedUpload) -> Iterator[tuple[int, dict]]:
+        if upload.members is not None:
+            return vision_engine.iter_files(upload.members)
+        return vision_engine.iter_directory(upload.extract_path)
+
+    def _micro_batches(self, documents: queue.Queue) -> Iterator[list[tuple[int, dict]]]:
+        """
+        Blocks for the next document, then takes whatever else is already
+        queued, up to EMBEDDING_MICRO_BATCH documents.
+        """
+        limit = max(1, settings.EMBEDDING_MICRO_BATCH)
+        while True:
+            item = documents.get()
+            if item is _END:
+                return
+            batch = [item]
+            while len(batch) < limit:
+                try:
+                    item = documents.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _END:
+                    yield batch
+                    return
+                batch.append(item)
+            yield batch
+
+ranking_pipeline = RankingPipeline()
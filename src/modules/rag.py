@@ -1,77 +1,404 @@
 import numpy as np
 import re
 import faiss
-from typing import List, Dict
+from typing import Callable, List, Dict, Optional
 from sentence_transformers import SentenceTransformer
 from src.core.config import settings
+from src.core.cache import VectorCache, hash64, sha256_text
+from src.modules.lexical import BM25Index, Hits, dense_share, fuse
 from src.core.logger import app_logger
+from src.core.lifecycle import Component, register
+from src.core.metrics import span
+from src.core.precision import check_precision, finalize_model, model_load_kwargs
 
-class RAGEngine:
-    def __init__(self):
-        app_logger.info(f"Loading Embedding Model: {settings.EMBEDDING_MODEL_ID}")
-        self.embed_model = SentenceTransformer(settings.EMBEDDING_MODEL_ID, trust_remote_code=True)
+# Tokens a chunk boundary may move back to land on the start of a word.
+MAX_BOUNDARY_BACKOFF = 16
+
+class RAGEngine(Component):
+    name = "embedder"
+
+    def __init__(self, precision: Optional[str] = None):
+        super().__init__()
+        self.precision = check_precision("EMBEDDING_PRECISION", precision or settings.EMBEDDING_PRECISION)
+
+    def _load(self):
+        app_logger.info(f"Loading Embedding Model: {settings.EMBEDDING_MODEL_ID} ({self.precision})")
+        self.embed_model = finalize_model(SentenceTransformer(
+            settings.EMBEDDING_MODEL_ID,
+            trust_remote_code=True,
+            model_kwargs=model_load_kwargs(self.precision)
+        ), self.precision)
         self.dimension = self.embed_model.get_sentence_embedding_dimension()
+        # Chunk budget in tokens, leaving room for the special tokens the model adds.
+        self.max_tokens = max(16, min(settings.CHUNK_TOKENS, self.embed_model.max_seq_length - 2))
+
+        self.embedding_cache = None
+        if settings.EMBEDDING_CACHE_ENABLED:
+            # One store per model and precision: vectors from different models never mix.
+            cache_id = settings.EMBEDDING_MODEL_ID
+            if self.precision != "auto":
+                cache_id = f"{cache_id}|{self.precision}"
+            cache_dir = settings.CACHE_DIR / "embeddings" / sha256_text(cache_id)[:16]
+            self.embedding_cache = VectorCache(cache_dir, self.dimension, settings.EMBEDDING_CACHE_CAPACITY)
+
+    def _warmup(self):
+        self.embed_query("warmup query")
 
     def clean_ocr_text(self, text: str) -> str:
         text = re.sub(r'[^a-zA-Z0-9\s.,:/()-]', ' ', text)
         text = re.sub(r'\s{2,}', ' ', text)
         return text.strip()
 
-    def create_index(self, documents: List[Dict]) -> tuple[faiss.Index, List[Dict]]:
+    def create_index(self, documents: List[Dict]) -> tuple[faiss.Index, List[Dict], Optional[BM25Index]]:
         """
-        Takes raw OCR results, chunks them, and builds a FAISS index.
-        Returns (index, metadata_map).
+        Takes raw OCR results, chunks them, and builds a FAISS index
+        plus, with HYBRID_SEARCH, a BM25 index over the same chunks.
+        Returns (index, metadata_map, lexical_index).
+        """
+        embeddings, chunked_docs = self.embed_documents(documents)
+
+        if embeddings is None:
+            return None, [], None
+
+        with span("indexing.faiss"):
+            index = faiss.IndexFlatIP(self.dimension)
+            index.add(embeddings)
+
+        lexical = None
+        if settings.HYBRID_SEARCH:
+            with span("indexing.bm25"):
+                lexical = BM25Index([chunk["content"] for chunk in chunked_docs])
+        
+        return index, chunked_docs, lexical
+
+    def embed_documents(self, documents: List[Dict]) -> tuple[Optional[np.ndarray], List[Dict]]:
+        """
+        Chunks raw OCR results and embeds every chunk.
+        Returns (embeddings, metadata_map) with one metadata entry per row.
         """
         chunked_docs = []
         texts_to_embed = []
+        token_lengths = []
 
         for doc in documents:
-            clean_text = self.clean_ocr_text(doc['text'])
-            chunks = self._chunk_text(clean_text)
-            for chunk in chunks:
+            with span("chunking"):
+                chunks = self._chunk_text(self.clean_ocr_text(doc['text']))
+            for chunk, start, end, tokens in chunks:
                 texts_to_embed.append(chunk)
+                token_lengths.append(tokens)
                 chunked_docs.append({
                     "filename": doc['filename'],
                     "content": chunk,
-                    "full_path": doc['path']
+                    "full_path": doc['path'],
+                    # Character span in the cleaned OCR text.
+                    "start": start,
+                    "end": end
                 })
 
         if not texts_to_embed:
             return None, []
 
-        embeddings = self.embed_model.encode(texts_to_embed, convert_to_numpy=True, normalize_embeddings=True)
+        embeddings = self.encode_chunks(texts_to_embed, token_lengths)
 
-        index = faiss.IndexFlatIP(self.dimension)
-        index.add(embeddings)
-        
-        return index, chunked_docs
+        return embeddings, chunked_docs
+
+    def encode_chunks(self, texts: List[str], token_lengths: Optional[List[int]] = None) -> np.ndarray:
+        """
+        Embeds chunk texts, serving repeats from the embedding cache so that
+        only unseen chunks reach the model.
+        """
+        if token_lengths is None:
+            token_lengths = self._token_lengths(texts)
+
+        if self.embedding_cache is None:
+            return self._encode_bucketed(texts, token_lengths)
 
-    def search(self, index: faiss.Index, metadata: List[Dict], query: str, k: int = 5):
+        keys = [self._chunk_key(text) for text in texts]
+        found, embeddings = self.embedding_cache.get_many(keys)
+
+        missing = {}
+        for i in np.flatnonzero(~found):
+            missing.setdefault(keys[i], []).append(i)
+
+        if missing:
+            miss_keys = list(missing)
+            miss_texts = [texts[missing[key][0]] for key in miss_keys]
+            miss_lengths = [token_lengths[missing[key][0]] for key in miss_keys]
+            fresh = self._encode_bucketed(miss_texts, miss_lengths)
+            for key, vector in zip(miss_keys, fresh):
+                embeddings[missing[key]] = vector
+            self.embedding_cache.put_many(miss_keys, fresh)
+
+        stats = self.embedding_cache.stats()
+        app_logger.info(
+            f"Embedding cache: {int(found.sum())}/{len(texts)} chunks cached, {len(missing)} encoded "
+            f"(lifetime hit rate {stats['hit_rate']:.0%}, {stats['entries']}/{stats['capacity']} rows)"
+        )
+        return embeddings
+
+    def _encode_bucketed(self, texts: List[str], token_lengths: List[int]) -> np.ndarray:
+        """
+        Encodes texts sorted by token length, in batches holding at most
+        EMBEDDING_BATCH_TOKENS padded tokens: every batch pads to a similar
+        length and short chunks go through in larger batches.
+        """
+        embeddings = np.empty((len(texts), self.dimension), dtype=np.float32)
+        order = np.argsort(token_lengths, kind="stable")
+        budget = max(1, settings.EMBEDDING_BATCH_TOKENS)
+
+        start = 0
+        while start < len(order):
+            end = start + 1
+            # Ascending order: the newest member is the longest, so it sets the padded width.
+            while end < len(order) and (end - start + 1) * token_lengths[order[end]] <= budget:
+                end += 1
+            batch = order[start:end]
+            with span("embedding.encode"):
+                embeddings[batch] = self.embed_model.encode(
+                    [texts[i] for i in batch],
+                    batch_size=len(batch),
+                    convert_to_numpy=True,
+                    normalize_embeddings=True
+                )
+            start = end
+
+        return embeddings
+
+    def _token_lengths(self, texts: List[str]) -> List[int]:
+        return [len(ids) for ids in self.embed_model.tokenizer(texts, truncation=True, max_length=self.max_tokens + 2).input_ids]
+
+    def _chunk_key(self, text: str) -> int:
+        normalized = " ".join(text.split())
+        return hash64(f"{settings.EMBEDDING_MODEL_ID}\0{normalized}")
+
+    def embed_query(self, query: str) -> np.ndarray:
+        with span("embedding.query"):
+            return self.embed_model.encode([query], convert_to_numpy=True, normalize_embeddings=True)
+
+    def search(
+        self,
+        index: faiss.Index,
+        metadata: List[Dict],
+        query: str,
+        k: int = 5,
+        lexical: Optional[BM25Index] = None
+    ):
         """
         Embeds the query and retrieves top-k chunks.
+        With a lexical index, only part of `k` comes from the dense search
+        (HYBRID_DENSE_RATIO) and the BM25 hits are fused in.
+        """
+        return self.search_many(index, metadata, [query], k, lexical)[0]
+
+    def search_many(
+        self,
+        index: faiss.Index,
+        metadata: List[Dict],
+        queries: List[str],
+        k: int = 5,
+        lexical: Optional[BM25Index] = None
+    ) -> List[List[Dict]]:
+        """
+        search() for several queries: one encode call and one matrix index.search.
         """
         if index is None or index.ntotal == 0:
-            return []
+            return [[] for _ in queries]
+
+        with span("embedding.query"):
+            query_vecs = self.embed_model.encode(queries, convert_to_numpy=True, normalize_embeddings=True)
+        dense_k = k if lexical is None else dense_share(k, settings.HYBRID_DENSE_RATIO)
+
+        with span("retrieval.dense"):
+            distances, indices = index.search(query_vecs, dense_k)
 
-        query_vec = self.embed_model.encode([query], convert_to_numpy=True, normalize_embeddings=True)
-        
-        distances, indices = index.search(query_vec, k)
-        
         results = []
-        for i, idx in enumerate(indices[0]):
-            if idx != -1:
-                results.append({
-                    "score": float(distances[0][i]),
-                    "chunk": metadata[idx]
-                })
+        for query, query_vec, row_distances, row_indices in zip(queries, query_vecs, distances, indices):
+            hits = [
+                (int(idx), float(score))
+                for idx, score in zip(row_indices, row_distances)
+                if idx != -1
+            ]
+
+            def similarity(row: int, query_vec: np.ndarray = query_vec) -> float:
+                return float(index.reconstruct(row) @ query_vec)
+
+            results.append(ranked_chunks(hits, metadata, query, k, lexical, similarity))
         return results
 
-    def _chunk_text(self, text: str, chunk_size: int = 300, overlap: int = 50) -> List[str]:
-        words = text.split()
+    def prefilter(self, retrieved_chunks: List[Dict], top_n: int) -> tuple[List[Dict], List[Dict]]:
+        """
+        Stage 0: pools the dense query-chunk similarities per document (a blend of
+        max and mean, PREFILTER_MAX_WEIGHT) and keeps only the chunks of the top_n
+        documents. Uses "dense_score", so hybrid fusion does not change its scale.
+        Returns (kept_chunks, skipped) where skipped is [{"filename", "score"}], best first.
+        """
+        if top_n <= 0 or not retrieved_chunks:
+            return retrieved_chunks, []
+
+        filenames, doc_ids = np.unique(
+            [item["chunk"]["filename"] for item in retrieved_chunks], return_inverse=True
+        )
+        if len(filenames) <= top_n:
+            return retrieved_chunks, []
+
+        scores = np.array([item["dense_score"] for item in retrieved_chunks], dtype=np.float64)
+        best = np.full(len(filenames), -np.inf)
+        np.maximum.at(best, doc_ids, scores)
+        mean = np.bincount(doc_ids, weights=scores) / np.bincount(doc_ids)
+
+        weight = settings.PREFILTER_MAX_WEIGHT
+        doc_scores = weight * best + (1 - weight) * mean
+        order = np.argsort(-doc_scores, kind="stable")
+        keep = np.zeros(len(filenames), dtype=bool)
+        keep[order[:top_n]] = True
+
+        kept = [item for item, doc in zip(retrieved_chunks, doc_ids) if keep[doc]]
+        skipped = [{"filename": str(filenames[doc]), "score": float(doc_scores[doc])} for doc in order[top_n:]]
+
+        app_logger.info(f"Prefilter: {top_n}/{len(filenames)} documents go to the LLM stages")
+        return kept, skipped
+
+    def start_searches(self, queries: List[str], k: int) -> List["StreamingSearch"]:
+        """
+        Exact top-k per query over chunks embedded in several batches (see StreamingSearch).
+        """
+        with span("embedding.query"):
+            query_vecs = self.embed_model.encode(queries, convert_to_numpy=True, normalize_embeddings=True)
+        return [
+            StreamingSearch(query_vec[None, :], k, lexical_query=query if settings.HYBRID_SEARCH else None)
+            for query, query_vec in zip(queries, query_vecs)
+        ]
+
+    def _chunk_text(self, text: str) -> List[tuple[str, int, int, int]]:
+        """
+        Splits text into windows of at most max_tokens embedding tokens with
+        CHUNK_OVERLAP_TOKENS of overlap, cut at word boundaries.
+        Returns (chunk, start char, end char, tokens incl. special tokens).
+        """
+        offsets = self.embed_model.tokenizer(
+            text, add_special_tokens=False, return_offsets_mapping=True, verbose=False
+        )["offset_mapping"]
+        if not offsets:
+            return []
+
+        def starts_word(i: int) -> bool:
+            char = offsets[i][0]
+            return char == 0 or text[char].isspace() or text[char - 1].isspace()
+
+        def word_start(i: int, floor: int) -> int:
+            # Step back over word-piece continuations, but never by more than a few tokens.
+            limit = max(floor + 1, i - MAX_BOUNDARY_BACKOFF)
+            j = i
+            while j > limit and not starts_word(j):
+                j -= 1
+            return j if starts_word(j) else i
+
+        size = self.max_tokens
+        overlap = min(max(0, settings.CHUNK_OVERLAP_TOKENS), size // 2)
         chunks = []
-        for i in range(0, len(words), chunk_size - overlap):
-            chunk = " ".join(words[i:i + chunk_size])
-            chunks.append(chunk)
-        return chunks
+        start = 0
+        while True:
+            end = len(offsets) if start + size >= len(offsets) else word_start(start + size, start)
+            char_start, char_end = offsets[start][0], offsets[end - 1][1]
+            chunks.append((text[char_start:char_end], char_start, char_end, end - start + 2))
+            if end == len(offsets):
+                return chunks
+            start = max(start + 1, word_start(end - overlap, start))
+
+def ranked_chunks(
+    dense: Hits,
+    metadata: List[Dict],
+    query: str,
+    k: int,
+    lexical: Optional[BM25Index],
+    similarity: Callable[[int], float]
+) -> List[Dict]:
+    """
+    Result dicts for dense hits, fused with the BM25 hits when there is a lexical index.
+    "score" orders the results (the fused score in hybrid mode); "dense_score" is
+    always the query-chunk cosine similarity, from `similarity(row)` for hits
+    only BM25 found.
+    """
+    dense_scores = dict(dense)
+    hits = dense
+    if lexical is not None:
+        with span("retrieval.lexical"):
+            lexical_hits = lexical.search(query, k)
+        hits = fuse(
+            dense,
+            lexical_hits,
+            k,
+            method=settings.HYBRID_FUSION,
+            dense_weight=settings.HYBRID_DENSE_WEIGHT,
+            rrf_k=settings.HYBRID_RRF_K
+        )
+    return [
+        {
+            "score": score,
+            "dense_score": dense_scores[row] if row in dense_scores else similarity(row),
+            "chunk": metadata[row]
+        }
+        for row, score in hits
+    ]
+
+
+class StreamingSearch:
+    """
+    Running inner-product top-k for embeddings that arrive in micro-batches.
+    Gives the same hits as IndexFlatIP.search over all of them at once; ties
+    are broken by arrival order instead of FAISS id.
+    With `lexical_query`, a BM25 index over every chunk seen is built once the
+    stream ends and fused in, as RAGEngine.search does.
+    """
+    def __init__(self, query_vec: np.ndarray, k: int, lexical_query: Optional[str] = None):
+        self.query = query_vec[0]
+        self.k = k
+        self.lexical_query = lexical_query
+        self.dense_k = k if lexical_query is None else dense_share(k, settings.HYBRID_DENSE_RATIO)
+        self.scores = np.empty(0, dtype=np.float32)
+        self.rows = np.empty(0, dtype=np.int64)
+        # Similarity of every chunk seen, for BM25 hits outside the dense top-k.
+        self.similarities: List[np.ndarray] = []
+        # Every chunk in arrival order; rows index into it.
+        self.chunks: List[Dict] = []
+
+    def add(self, embeddings: Optional[np.ndarray], chunks: List[Dict]):
+        if embeddings is None or not chunks:
+            return
+        rows = np.arange(len(self.chunks), len(self.chunks) + len(chunks), dtype=np.int64)
+        self.chunks.extend(chunks)
+
+        with span("retrieval.dense"):
+            batch_scores = embeddings @ self.query
+            self.similarities.append(batch_scores)
+            scores = np.concatenate([self.scores, batch_scores])
+            rows = np.concatenate([self.rows, rows])
+            if len(scores) > self.dense_k:
+                keep = np.sort(np.argpartition(-scores, self.dense_k - 1)[:self.dense_k])
+                scores = scores[keep]
+                rows = rows[keep]
+        self.scores = scores
+        self.rows = rows
+
+    def lexical_index(self) -> Optional[BM25Index]:
+        """
+        BM25 over every chunk seen, or None without a lexical query.
+        Searches fed the same chunks can share it.
+        """
+        if self.lexical_query is None or not self.chunks:
+            return None
+        with span("indexing.bm25"):
+            return BM25Index([chunk["content"] for chunk in self.chunks])
+
+    def results(self, lexical: Optional[BM25Index] = None) -> List[Dict]:
+        order = np.argsort(-self.scores, kind="stable")
+        dense = [(int(self.rows[i]), float(self.scores[i])) for i in order]
+
+        if lexical is None:
+            lexical = self.lexical_index()
+        similarities = np.concatenate(self.similarities) if self.similarities else self.scores
+        return ranked_chunks(
+            dense, self.chunks, self.lexical_query or "", self.k, lexical, lambda row: float(similarities[row])
+        )
 
-rag_engine = RAGEngine()
\ No newline at end of file
+rag_engine = register(RAGEngine())
\ No newline at end of file
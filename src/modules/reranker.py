@@ -0,0 +1,132 @@
+import torch
+import numpy as np
+from typing import List, Dict
+from transformers import AutoModelForCausalLM, AutoTokenizer
+from src.core.config import settings
+from src.core.logger import app_logger
+from src.core.lifecycle import Component, register
+from src.core.metrics import span
+from src.core.precision import check_precision, finalize_model, model_load_kwargs
+
+# Prompt format of the Qwen3-Reranker models: the relevance score is P("yes")
+# at the answer position, normalised against P("no").
+RERANK_SYSTEM = (
+    "Judge whether the Document meets the requirements based on the Query and the Instruct provided. "
+    "Note that the answer can only be \"yes\" or \"no\"."
+)
+RERANK_INSTRUCTION = "Given a job description, judge whether this resume excerpt shows the experience and skills it asks for"
+RERANK_PREFIX = f"<|im_start|>system\n{RERANK_SYSTEM}<|im_end|>\n<|im_start|>user\n"
+RERANK_SUFFIX = "<|im_end|>\n<|im_start|>assistant\n<think>\n\n</think>\n\n"
+
+
+class ChunkReranker(Component):
+    """
+    Cross-encoder pass over the retrieved chunks. Scores every (JD, chunk) pair
+    in batches, then keeps each candidate's best chunks within a token budget
+    so the Stage-1 prompts are shorter and more on-topic.
+    """
+
+    name = "reranker"
+
+    def __init__(self):
+        super().__init__()
+        self.enabled = settings.RERANKER_ENABLED
+
+    def _load(self):
+        if not self.enabled:
+            return
+
+        app_logger.info(f"Loading Reranker Model: {settings.RERANKER_MODEL_ID}")
+
+        self.tokenizer = AutoTokenizer.from_pretrained(settings.RERANKER_MODEL_ID, trust_remote_code=True)
+        self.tokenizer.padding_side = "left"
+        if self.tokenizer.pad_token is None:
+            self.tokenizer.pad_token = self.tokenizer.eos_token
+
+        # Same architecture family as the LLM, so it follows LLM_PRECISION.
+        precision = check_precision("LLM_PRECISION", settings.LLM_PRECISION)
+        self.model = finalize_model(AutoModelForCausalLM.from_pretrained(
+            settings.RERANKER_MODEL_ID,
+            device_map="auto",
+            trust_remote_code=True,
+            **model_load_kwargs(precision)
+        ).eval(), precision)
+
+        self.yes_id = self.tokenizer.encode("yes", add_special_tokens=False)[0]
+        self.no_id = self.tokenizer.encode("no", add_special_tokens=False)[0]
+        self.prefix_ids = self.tokenizer.encode(RERANK_PREFIX, add_special_tokens=False)
+        self.suffix_ids = self.tokenizer.encode(RERANK_SUFFIX, add_special_tokens=False)
+
+    def _warmup(self):
+        if self.enabled:
+            self.score("Python developer", ["Python developer, 3 years."])
+
+    def rerank(self, job_description: str, retrieved_chunks: List[Dict]) -> List[Dict]:
+        """
+        Returns the kept chunks, best first, each with an added "rerank_score".
+        Per candidate, chunks are taken in rerank order until RERANKER_CONTEXT_TOKENS
+        is spent; the best chunk is always kept.
+        """
+        if not self.enabled or not retrieved_chunks:
+            return retrieved_chunks
+
+        contents = [item["chunk"]["content"] for item in retrieved_chunks]
+        scores = self.score(job_description, contents)
+        lengths = [len(ids) for ids in self.tokenizer(contents, add_special_tokens=False).input_ids]
+
+        spent: Dict[str, int] = {}
+        kept = []
+        for i in np.argsort(-scores, kind="stable"):
+            filename = retrieved_chunks[i]["chunk"]["filename"]
+            used = spent.get(filename)
+            if used is not None and used + lengths[i] > settings.RERANKER_CONTEXT_TOKENS:
+                continue
+            spent[filename] = (used or 0) + lengths[i]
+            kept.append({**retrieved_chunks[i], "rerank_score": float(scores[i])})
+
+        app_logger.info(f"Reranker: kept {len(kept)}/{len(retrieved_chunks)} chunks for {len(spent)} candidates")
+        return kept
+
+    def score(self, query: str, documents: List[str]) -> np.ndarray:
+        """
+        Relevance in [0, 1] for each document. Pairs are length-sorted and batched
+        by RERANKER_BATCH_SIZE; documents are truncated so a pair fits RERANKER_MAX_LENGTH.
+        """
+        head = self._head_ids(query)
+        room = max(0, settings.RERANKER_MAX_LENGTH - len(self.prefix_ids) - len(head) - len(self.suffix_ids))
+        pairs = [
+            self.prefix_ids + head + ids[:room] + self.suffix_ids
+            for ids in self.tokenizer(documents, add_special_tokens=False).input_ids
+        ]
+        order = sorted(range(len(pairs)), key=lambda i: len(pairs[i]))
+        scores = np.zeros(len(pairs), dtype=np.float32)
+
+        batch_size = max(1, settings.RERANKER_BATCH_SIZE)
+        for start in range(0, len(order), batch_size):
+            batch = order[start:start + batch_size]
+            inputs = self.tokenizer.pad(
+                {"input_ids": [pairs[i] for i in batch]}, padding=True, return_tensors="pt"
+            ).to(self.model.device)
+
+            # Only the answer position is scored, so only its logits are computed:
+            # the full [batch, seq, vocab] tensor would run to gigabytes.
+            with span("reranker.forward"), torch.no_grad():
+                logits = self.model(**inputs, logits_to_keep=1).logits[:, -1, :]
+            yes_no = torch.stack([logits[:, self.no_id], logits[:, self.yes_id]], dim=1).float()
+            scores[batch] = torch.softmax(yes_no, dim=1)[:, 1].cpu().numpy()
+
+        return scores
+
+    def _head_ids(self, query: str) -> List[int]:
+        """
+        Instruction and query tokens shared by every pair; a long JD is cut to
+        half the pair budget so the documents keep room.
+        """
+        query_ids = self.tokenizer.encode(query, add_special_tokens=False)[:settings.RERANKER_MAX_LENGTH // 2]
+        return (
+            self.tokenizer.encode(f"<Instruct>: {RERANK_INSTRUCTION}\n<Query>: ", add_special_tokens=False)
+            + query_ids
+            + self.tokenizer.encode("\n<Document>: ", add_special_tokens=False)
+        )
+
+chunk_reranker = register(ChunkReranker())
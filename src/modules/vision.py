@@ -1,83 +1,544 @@
+import os
+import re
+import time
 import cv2
+import tempfile
+import subprocess
 import numpy as np
 import pytesseract
-from pathlib import Path
-from pdf2image import convert_from_path
+import multiprocessing
+from pathlib import Path, PurePosixPath
+from typing import Iterator, Optional, Union
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pdf2image import convert_from_path, pdfinfo_from_path
+from src.core.config import settings
+from src.core.cache import DiskCache, sha256_bytes, sha256_file, sha256_text
 from src.core.logger import app_logger
+from src.core.metrics import observe_span, span
+from src.core.lifecycle import Component, register
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp", ".tiff"}
+
+# pdfinfo -l beyond the last page is clamped, so this asks for every page size.
+PDFINFO_LAST_PAGE = 1_000_000
+PAGE_SIZE_KEY = re.compile(r"^Page\s+(\d+) size$")
+PAGE_SIZE_VALUE = re.compile(r"^([\d.]+) x ([\d.]+) pts")
+
+PREPROCESSING_MODES = {"fixed", "adaptive"}
+# Adaptive preprocessing: Tesseract reads best with glyphs around this many pixels tall.
+TARGET_TEXT_HEIGHT = 28
+# Measured scales inside this band are close enough; resizing would only cost time.
+SCALE_TOLERANCE = (0.8, 1.25)
+# A page whose darkest and lightest pixels differ by less than this has no text.
+BLANK_CONTRAST = 32
+MIN_GLYPH_AREA = 6
+MIN_GLYPHS = 10
+
+# A document is either a file on disk or the raw bytes of a zip member.
+Source = Union[Path, bytes]
+# Page sizes, text layer per page, and seconds per probe step (recorded by the parent).
+PdfProbe = tuple[list[Optional[tuple[float, float]]], list[Optional[str]], dict[str, float]]
+
+
+def _init_ocr_worker():
+    # Parallelism comes from the pool, so each Tesseract process gets one thread.
+    os.environ["OMP_THREAD_LIMIT"] = "1"
+    cv2.setNumThreads(1)
+
+
+def _worker_ready(_: int) -> int:
+    return os.getpid()
+
+
+def _ocr_page_task(task: tuple) -> tuple[Optional[str], Optional[str], float]:
+    """
+    Pool entrypoint. Returns (text, error, seconds) so failures are reported,
+    and the page timed, by the parent.
+    """
+    source, is_pdf, page_number, dpi = task
+    start = time.perf_counter()
+    try:
+        return vision_engine._ocr_page(source, is_pdf, page_number, dpi), None, time.perf_counter() - start
+    except Exception as e:
+        return None, str(e), time.perf_counter() - start
+
+
+def _probe_pdf_task(task: tuple) -> tuple[Optional[PdfProbe], Optional[str]]:
+    """
+    Pool entrypoint for a PDF's page sizes and text layer. Returns (probe, error).
+    """
+    name, source = task
+    try:
+        return vision_engine._probe_pdf(name, source), None
+    except Exception as e:
+        return None, str(e)
+
+
+class VisionEngine(Component):
+    name = "ocr"
 
-class VisionEngine:
     def __init__(self):
+        super().__init__()
         self.custom_config = r'--oem 3 --psm 4'
+        self.pdf_dpi = 300
+        self.scale_factor = 2.0
+        # PDFs are rendered straight at pdf_dpi * scale_factor (no separate upscale),
+        # unless that would exceed the per-page pixel ceiling.
+        self.max_page_pixels = settings.OCR_MAX_PAGE_PIXELS
+        if settings.OCR_PREPROCESSING not in PREPROCESSING_MODES:
+            raise ValueError(f"OCR_PREPROCESSING must be one of {sorted(PREPROCESSING_MODES)}")
+        self.preprocessing = settings.OCR_PREPROCESSING
+        self.workers = max(1, settings.OCR_WORKERS)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._cache: Optional[DiskCache] = None
+
+    def _load(self):
+        try:
+            app_logger.info(f"Tesseract {pytesseract.get_tesseract_version()}")
+        except Exception as e:
+            # Documents with a PDF text layer can still be read.
+            app_logger.warning(f"Tesseract unavailable: {e}")
+
+    def _warmup(self):
+        # Spawned workers pay their imports on first use; pay it here instead.
+        if self.workers > 1:
+            list(self._get_executor().map(_worker_ready, range(self.workers)))
+
+    @property
+    def cache(self) -> Optional[DiskCache]:
+        """
+        Opened on first use so that pool workers never touch the SQLite file.
+        """
+        if self._cache is None and settings.OCR_CACHE_ENABLED:
+            self._cache = DiskCache(settings.CACHE_DIR / "ocr.sqlite3", max_bytes=settings.OCR_CACHE_MAX_BYTES)
+        return self._cache
 
     def process_directory(self, directory: Path) -> list[dict]:
-        results = []
-        image_extensions = {".jpg", ".jpeg", ".png", ".bmp", ".tiff"}
-        
-        for file_path in directory.rglob("*"):
-            if file_path.name.startswith("."): 
-                continue
-            
-            suffix = file_path.suffix.lower()
-            text = ""
-            
-            try:
-                if suffix == ".pdf":
-                    try:
-                        pages = convert_from_path(str(file_path), dpi=300)
-                        
-                        for page in pages:
-                            img_array = np.array(page)
-                            img_bgr = cv2.cvtColor(img_array, cv2.COLOR_RGB2BGR)
-                            
-                            page_text = self._process_cv2_image(img_bgr)
-                            text += page_text + "\n"
-                            
-                    except Exception as e:
-                        app_logger.warning(f"Could not convert PDF {file_path.name}: {e}")
-                        continue
-
-                elif suffix in image_extensions:
-                    img = cv2.imread(str(file_path))
-                    if img is None:
-                        continue
-                    text = self._process_cv2_image(img)
+        """
+        OCRs every supported file under an extracted upload directory.
+        """
+        return self._collect(self.iter_directory(directory))
 
-                else:
+    def process_files(self, files: list[tuple[str, bytes]]) -> list[dict]:
+        """
+        OCRs in-memory (member name, bytes) pairs straight from a zip upload.
+        """
+        return self._collect(self.iter_files(files))
+
+    def iter_directory(self, directory: Path) -> Iterator[tuple[int, dict]]:
+        """
+        Like process_directory, but yields (position, result) as each document finishes.
+        """
+        documents = [
+            (file_path.name, str(file_path), file_path)
+            for file_path in sorted(directory.rglob("*"))
+            if file_path.is_file() and self.is_supported(file_path.name)
+        ]
+        return self._iter_documents(documents)
+
+    def iter_files(self, files: list[tuple[str, bytes]]) -> Iterator[tuple[int, dict]]:
+        """
+        Like process_files, but yields (position, result) as each document finishes.
+        """
+        documents = [
+            (PurePosixPath(name).name, name, data)
+            for name, data in sorted(files, key=lambda item: item[0])
+            if self.is_supported(name)
+        ]
+        return self._iter_documents(documents)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+    def is_supported(self, name: str) -> bool:
+        """
+        PDFs and images by extension; dotfiles (e.g. macOS `._` forks) are skipped.
+        """
+        path = PurePosixPath(name)
+        if path.name.startswith("."):
+            return False
+        suffix = path.suffix.lower()
+        return suffix == ".pdf" or suffix in IMAGE_EXTENSIONS
+
+    def _collect(self, finished: Iterator[tuple[int, dict]]) -> list[dict]:
+        return [result for _, result in sorted(finished, key=lambda item: item[0])]
+
+    def _iter_documents(self, documents: list[tuple[str, str, Source]]) -> Iterator[tuple[int, dict]]:
+        """
+        documents: (filename, path label, source), already in a stable order.
+        Yields (position, result) for every readable document in completion order:
+        cache hits first, then each file as soon as all of its pages are OCR'd.
+        """
+        keys: list[Optional[str]] = [None] * len(documents)
+        pending = []
+        hits = 0
+
+        for i, (_, _, source) in enumerate(documents):
+            if self.cache is not None:
+                keys[i] = self._cache_key(source)
+                cached = self.cache.get(keys[i])
+                if cached is not None:
+                    hits += 1
+                    result = self._to_result(documents[i], cached)
+                    if result is not None:
+                        yield i, result
                     continue
+            pending.append(i)
+
+        pending_docs = [(documents[i][0], documents[i][2]) for i in pending]
+        if self.workers > 1 and len(pending_docs) > 0:
+            ocr_texts = self._ocr_parallel(pending_docs)
+        else:
+            ocr_texts = (
+                (j, self._ocr_file(name, source)) for j, (name, source) in enumerate(pending_docs)
+            )
+
+        for j, text in ocr_texts:
+            i = pending[j]
+            if text is None:
+                continue
+            if self.cache is not None:
+                self.cache.set(keys[i], text)
+            result = self._to_result(documents[i], text)
+            if result is not None:
+                yield i, result
+
+        if self.cache is not None:
+            stats = self.cache.stats()
+            app_logger.info(
+                f"OCR cache: {hits}/{len(documents)} hits this batch "
+                f"(lifetime hit rate {stats['hit_rate']:.0%}, {stats['entries']} entries)"
+            )
+
+    def _to_result(self, document: tuple[str, str, Source], text: str) -> Optional[dict]:
+        filename, path, _ = document
+        if not self._is_valid_ocr(text):
+            app_logger.warning(f"Rejected file (low text quality): {filename}")
+            return None
+        return {
+            "filename": filename,
+            "text": text,
+            "path": path
+        }
+
+    def _cache_key(self, source: Source) -> str:
+        """
+        Content hash of the file plus every setting that changes the OCR output.
+        """
+        content_hash = sha256_bytes(source) if isinstance(source, bytes) else sha256_file(source)
+        ocr_config = (
+            f"{self.custom_config}|dpi={self.pdf_dpi}|scale={self.scale_factor}"
+            f"|gray|max_pixels={self.max_page_pixels}|preprocessing={self.preprocessing}"
+            f"|text_layer={settings.PDF_TEXT_LAYER}"
+        )
+        return f"{content_hash}:{sha256_text(ocr_config)}"
 
-                if self._is_valid_ocr(text):
-                    results.append({
-                        "filename": file_path.name,
-                        "text": text,
-                        "path": str(file_path)
-                    })
+    def _ocr_file(self, name: str, source: Source) -> Optional[str]:
+        is_pdf = PurePosixPath(name).suffix.lower() == ".pdf"
+        try:
+            if is_pdf:
+                pdf_path = self._spill(source) if isinstance(source, bytes) else source
+                try:
+                    page_sizes, text_layer, timings = self._probe_pdf(name, pdf_path)
+                    for step, seconds in timings.items():
+                        observe_span(step, seconds)
+                    return "".join(
+                        (
+                            text_layer[page - 1]
+                            or self._timed_ocr_page(pdf_path, True, page, self._render_dpi(page_sizes[page - 1]))
+                        ) + "\n"
+                        for page in range(1, len(page_sizes) + 1)
+                    )
+                except Exception as e:
+                    app_logger.warning(f"Could not convert PDF {name}: {e}")
+                    return None
+                finally:
+                    if pdf_path is not source:
+                        pdf_path.unlink(missing_ok=True)
+
+            return self._timed_ocr_page(source, False, None)
+
+        except Exception as e:
+            app_logger.error(f"Error processing {name}: {e}")
+            return None
+
+    def _ocr_parallel(self, documents: list[tuple[str, Source]]) -> Iterator[tuple[int, Optional[str]]]:
+        """
+        Runs everything per document on the process pool: an image is one task;
+        a PDF is first probed (page sizes, text layer) and its pages without a
+        usable text layer are submitted as soon as that probe returns.
+        Yields (position, text) for each file once all of its pages are back, so
+        a born-digital PDF is done as soon as its own probe is.
+        Pages are reassembled by page number, so the text is deterministic.
+        An in-memory PDF is written to one temp file for the probe and all of
+        its page tasks, instead of being pickled to the pool with every task.
+        """
+        executor = self._get_executor()
+        # future -> (document, page number); page 0 is an image, None a PDF probe.
+        pending: dict = {}
+        pages: list[dict[int, str]] = [{} for _ in documents]
+        outstanding = [1] * len(documents)
+        failed: set[int] = set()
+        pdf_flags = [PurePosixPath(name).suffix.lower() == ".pdf" for name, _ in documents]
+        spilled: dict[int, Path] = {}
+        ocr_pages = 0
+
+        def release(owner: int):
+            path = spilled.pop(owner, None)
+            if path is not None:
+                path.unlink(missing_ok=True)
+
+        def assemble(owner: int) -> Optional[str]:
+            if owner in failed:
+                return None
+            if pdf_flags[owner]:
+                return "".join(pages[owner][page] + "\n" for page in sorted(pages[owner]))
+            return pages[owner][0]
+
+        try:
+            for i, (name, source) in enumerate(documents):
+                if pdf_flags[i]:
+                    if isinstance(source, bytes):
+                        source = spilled[i] = self._spill(source)
+                    pending[executor.submit(_probe_pdf_task, (name, source))] = (i, None)
                 else:
-                    app_logger.warning(f"Rejected file (low text quality): {file_path.name}")
+                    pending[executor.submit(_ocr_page_task, (source, False, None, None))] = (i, 0)
+                    ocr_pages += 1
+
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    owner, page_number = pending.pop(future)
+                    name = documents[owner][0]
+                    outstanding[owner] -= 1
+
+                    if page_number is None:
+                        probe, error = future.result()
+                        if error is not None:
+                            app_logger.warning(f"Could not convert PDF {name}: {error}")
+                            failed.add(owner)
+                        else:
+                            page_sizes, text_layer, timings = probe
+                            for step, seconds in timings.items():
+                                observe_span(step, seconds)
+                            pdf_path = spilled.get(owner, documents[owner][1])
+                            for page in range(1, len(page_sizes) + 1):
+                                if text_layer[page - 1] is not None:
+                                    pages[owner][page] = text_layer[page - 1]
+                                    continue
+                                task = (pdf_path, True, page, self._render_dpi(page_sizes[page - 1]))
+                                pending[executor.submit(_ocr_page_task, task)] = (owner, page)
+                                outstanding[owner] += 1
+                                ocr_pages += 1
+                    else:
+                        text, error, seconds = future.result()
+                        observe_span("ocr.page", seconds)
+                        if error is not None:
+                            if owner not in failed:
+                                app_logger.error(f"Error processing {name}: {error}")
+                            failed.add(owner)
+                        else:
+                            pages[owner][page_number] = text
+
+                    if outstanding[owner] == 0:
+                        release(owner)
+                        yield owner, assemble(owner)
+        finally:
+            # Also reached when the consumer stops early; queued tasks may then
+            # fail on the missing file, which nobody is waiting for.
+            for owner in list(spilled):
+                release(owner)
+
+        app_logger.info(f"OCR: {ocr_pages} pages from {len(documents)} files on {self.workers} workers")
+
+    def _spill(self, data: bytes) -> Path:
+        """
+        Writes an in-memory PDF to a temp file under UPLOAD_DIR; the caller removes it.
+        """
+        fd, path = tempfile.mkstemp(suffix=".pdf", dir=settings.UPLOAD_DIR)
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        return Path(path)
+
+    def _probe_pdf(self, name: str, source: Path) -> PdfProbe:
+        """
+        Page sizes and text layer of one PDF. May run in a pool worker, so the
+        step timings are returned for the caller to record.
+        """
+        start = time.perf_counter()
+        page_sizes = self._pdf_page_sizes(source)
+        timings = {"ocr.pdfinfo": time.perf_counter() - start}
+
+        start = time.perf_counter()
+        text_layer = self._pdf_text_layer(name, source, len(page_sizes))
+        if settings.PDF_TEXT_LAYER and page_sizes:
+            timings["ocr.text_layer"] = time.perf_counter() - start
+        return page_sizes, text_layer, timings
+
+    def _pdf_text_layer(self, name: str, source: Path, page_count: int) -> list[Optional[str]]:
+        """
+        Embedded text per page via poppler's pdftotext. A page is None when its
+        text layer is missing or fails _is_valid_ocr, so it gets rasterized and OCR'd.
+        """
+        if not settings.PDF_TEXT_LAYER or page_count == 0:
+            return [None] * page_count
+
+        try:
+            output = subprocess.run(
+                ["pdftotext", "-enc", "UTF-8", "-l", str(page_count), str(source), "-"],
+                capture_output=True, check=True, timeout=60
+            ).stdout
+        except (OSError, subprocess.SubprocessError) as e:
+            app_logger.warning(f"No text layer for {name}, using OCR: {e}")
+            return [None] * page_count
+
+        # pdftotext ends every page with a form feed.
+        page_texts = output.decode("utf-8", errors="replace").split("\f")
+        text_layer = [
+            page_texts[i] if i < len(page_texts) and self._is_valid_ocr(page_texts[i]) else None
+            for i in range(page_count)
+        ]
 
-            except Exception as e:
-                app_logger.error(f"Error processing {file_path.name}: {e}")
+        native = sum(text is not None for text in text_layer)
+        app_logger.debug(f"{name}: {native}/{page_count} pages from the text layer")
+        return text_layer
 
-        return results
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn: the parent holds torch thread pools that must not be forked.
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_ocr_worker
+            )
+        return self._executor
 
-    def _process_cv2_image(self, img: np.ndarray) -> str:
-        img = cv2.resize(img, None, fx=2.0, fy=2.0, interpolation=cv2.INTER_CUBIC)
+    def _pdf_page_sizes(self, source: Path) -> list[Optional[tuple[float, float]]]:
+        """
+        (width, height) in points for every page, None where pdfinfo does not report it.
+        """
+        # pdfinfo clamps -l to the real page count.
+        info = pdfinfo_from_path(str(source), first_page=1, last_page=PDFINFO_LAST_PAGE)
 
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        sizes: list[Optional[tuple[float, float]]] = [None] * int(info["Pages"])
+        for key, value in info.items():
+            page = PAGE_SIZE_KEY.match(key)
+            size = PAGE_SIZE_VALUE.match(str(value))
+            if page and size and 1 <= int(page.group(1)) <= len(sizes):
+                sizes[int(page.group(1)) - 1] = (float(size.group(1)), float(size.group(2)))
+        return sizes
+
+    def _render_dpi(self, page_size: Optional[tuple[float, float]]) -> int:
+        """
+        Target DPI for a PDF page, lowered when the grayscale raster would
+        exceed max_page_pixels (one byte per pixel).
+        Adaptive preprocessing renders at pdf_dpi and rescales from the measured text height.
+        """
+        dpi = self.pdf_dpi if self.preprocessing == "adaptive" else self.pdf_dpi * self.scale_factor
+        if page_size is not None:
+            width_in, height_in = page_size[0] / 72, page_size[1] / 72
+            if width_in > 0 and height_in > 0:
+                dpi = min(dpi, (self.max_page_pixels / (width_in * height_in)) ** 0.5)
+        return max(1, int(dpi))
+
+    def _image_scale(self, img: np.ndarray) -> float:
+        """
+        Upscale factor for a raster upload, capped by the same pixel ceiling.
+        """
+        height, width = img.shape[:2]
+        return min(self.scale_factor, (self.max_page_pixels / max(1, height * width)) ** 0.5)
+
+    def _timed_ocr_page(self, source: Source, is_pdf: bool, page_number: Optional[int], dpi: Optional[int] = None) -> str:
+        # In-process path; pool workers are timed by the parent from _ocr_page_task.
+        with span("ocr.page"):
+            return self._ocr_page(source, is_pdf, page_number, dpi)
+
+    def _ocr_page(self, source: Source, is_pdf: bool, page_number: Optional[int], dpi: Optional[int] = None) -> str:
+        """
+        OCRs a single image (file or bytes), or a single 1-based page of a PDF file.
+        Only that page is rasterized, directly in grayscale, so memory per call
+        is bounded by max_page_pixels regardless of the document length.
+        """
+        if not is_pdf:
+            if isinstance(source, bytes):
+                img = cv2.imdecode(np.frombuffer(source, dtype=np.uint8), cv2.IMREAD_GRAYSCALE)
+            else:
+                img = cv2.imread(str(source), cv2.IMREAD_GRAYSCALE)
+            if img is None:
+                raise ValueError("unreadable image")
+            return self._ocr_gray(img, self._image_scale(img))
+
+        page_range = dict(
+            dpi=dpi or self._render_dpi(None),
+            first_page=page_number,
+            last_page=page_number,
+            grayscale=True
+        )
+        pages = convert_from_path(str(source), **page_range)
+
+        img = np.asarray(pages[0])
+        pages.clear()
+        return self._ocr_gray(img, 1.0)
+
+    def _ocr_gray(self, gray: np.ndarray, scale: float) -> str:
+        if self.preprocessing == "adaptive":
+            gray = self._adaptive_preprocess(gray)
+            if gray is None:
+                return ""
+        elif scale != 1.0:
+            gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_CUBIC)
 
         return pytesseract.image_to_string(gray, config=self.custom_config)
 
+    def _adaptive_preprocess(self, gray: np.ndarray) -> Optional[np.ndarray]:
+        """
+        Crops blank margins and rescales only as far as needed to bring the
+        median glyph height to TARGET_TEXT_HEIGHT. Returns None for a blank page.
+        """
+        if int(gray.max()) - int(gray.min()) < BLANK_CONTRAST:
+            return None
+
+        _, ink = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV | cv2.THRESH_OTSU)
+        count, _, stats, _ = cv2.connectedComponentsWithStats(ink, connectivity=8)
+
+        # Row 0 is the background; drop specks and page-sized blobs (rules, photos).
+        glyphs = stats[1:count]
+        heights = glyphs[:, cv2.CC_STAT_HEIGHT]
+        keep = (glyphs[:, cv2.CC_STAT_AREA] >= MIN_GLYPH_AREA) & (heights < gray.shape[0] // 10)
+        if keep.sum() < MIN_GLYPHS:
+            return None
+        glyphs = glyphs[keep]
+
+        text_height = float(np.median(glyphs[:, cv2.CC_STAT_HEIGHT]))
+        pad = int(2 * text_height)
+        left = max(0, int(glyphs[:, cv2.CC_STAT_LEFT].min()) - pad)
+        top = max(0, int(glyphs[:, cv2.CC_STAT_TOP].min()) - pad)
+        right = min(gray.shape[1], int((glyphs[:, cv2.CC_STAT_LEFT] + glyphs[:, cv2.CC_STAT_WIDTH]).max()) + pad)
+        bottom = min(gray.shape[0], int((glyphs[:, cv2.CC_STAT_TOP] + glyphs[:, cv2.CC_STAT_HEIGHT]).max()) + pad)
+        gray = gray[top:bottom, left:right]
+
+        scale = TARGET_TEXT_HEIGHT / max(1.0, text_height)
+        scale = min(scale, (self.max_page_pixels / max(1, gray.shape[0] * gray.shape[1])) ** 0.5)
+        if SCALE_TOLERANCE[0] <= scale <= SCALE_TOLERANCE[1]:
+            return gray
+
+        interpolation = cv2.INTER_AREA if scale < 1 else cv2.INTER_CUBIC
+        return cv2.resize(gray, None, fx=scale, fy=scale, interpolation=interpolation)
+
     def _is_valid_ocr(self, text: str) -> bool:
         if not text or len(text.strip()) < 50:
             return False
 
         alnum_count = sum(c.isalnum() for c in text)
         total_chars = len(text.strip())
-        
+
         if total_chars == 0: return False
-        
+
         if (alnum_count / total_chars) < 0.4:
             return False
-            
+
         return True
 
-vision_engine = VisionEngine()
\ No newline at end of file
+vision_engine = register(VisionEngine())
@@ -0,0 +1,65 @@
+import time
+import numpy as np
+from src.core.cache import DiskCache, VectorCache
+
+
+def test_vector_cache_evicts_least_recently_used(tmp_path):
+    cache = VectorCache(tmp_path, dimension=2, capacity=2)
+    cache.put_many([1, 2], np.array([[1, 1], [2, 2]], dtype=np.float32))
+    cache.get_many([1])
+    cache.put_many([3], np.array([[3, 3]], dtype=np.float32))
+
+    found, vectors = cache.get_many([1, 2, 3])
+    assert found.tolist() == [True, False, True]
+    assert vectors[2].tolist() == [3, 3]
+    assert cache.stats()["evictions"] == 1
+
+
+def test_vector_cache_survives_reopen(tmp_path):
+    cache = VectorCache(tmp_path, dimension=2, capacity=4)
+    cache.put_many([7], np.array([[0.5, -1]], dtype=np.float32))
+
+    reopened = VectorCache(tmp_path, dimension=2, capacity=4)
+    found, vectors = reopened.get_many([7])
+    assert found.tolist() == [True]
+    assert vectors[0].tolist() == [0.5, -1]
+
+
+def test_vector_cache_resets_on_shape_change(tmp_path):
+    VectorCache(tmp_path, dimension=2, capacity=4).put_many([7], np.ones((1, 2), dtype=np.float32))
+
+    reopened = VectorCache(tmp_path, dimension=3, capacity=4)
+    found, _ = reopened.get_many([7])
+    assert not found.any()
+
+
+def test_disk_cache_evicts_least_recently_used(tmp_path):
+    cache = DiskCache(tmp_path / "cache.sqlite3", max_bytes=20)
+    cache.set("a", "x" * 6)
+    time.sleep(0.01)
+    cache.set("b", "y" * 6)
+    time.sleep(0.01)
+    cache.get("a")
+    cache.set("c", "z" * 6)
+
+    assert cache.get("a") == "x" * 6
+    assert cache.get("b") is None
+    assert cache.get("c") == "z" * 6
+    assert cache.stats()["size_bytes"] <= 20
+
+
+def test_disk_cache_expires_after_ttl(tmp_path):
+    cache = DiskCache(tmp_path / "cache.sqlite3", max_bytes=1024, ttl_seconds=0.05)
+    cache.set("a", {"v": 1})
+    assert cache.get("a") == {"v": 1}
+
+    time.sleep(0.1)
+    assert cache.get("a") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_disk_cache_survives_reopen(tmp_path):
+    DiskCache(tmp_path / "cache.sqlite3", max_bytes=1024).set("a", [1, 2])
+
+    reopened = DiskCache(tmp_path / "cache.sqlite3", max_bytes=1024)
+    assert reopened.get("a") == [1, 2]
@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+from fastapi import HTTPException
+from src.modules.corpus import Corpus
+
+DIMENSION = 4
+
+
+def documents(*names):
+    docs = [{"filename": name, "text": f"{name} text"} for name in names]
+    chunks = [{"filename": name, "content": f"{name} chunk"} for name in names]
+    embeddings = np.eye(len(names), DIMENSION, dtype=np.float32)
+    return docs, embeddings, chunks
+
+
+@pytest.fixture
+def corpus(tmp_path):
+    corpus = Corpus("test", tmp_path / "test", DIMENSION, "flat")
+    corpus.add_documents(*documents("a.pdf"))
+    yield corpus
+    corpus.close()
+
+
+def test_duplicate_filenames_are_rejected_untouched(corpus):
+    before = corpus.stats()
+    with pytest.raises(HTTPException) as error:
+        corpus.add_documents(*documents("b.pdf", "b.pdf"))
+
+    assert error.value.status_code == 400
+    assert corpus.stats() == before
+
+
+def test_failed_write_rolls_back(corpus):
+    before = corpus.stats()
+    docs, _, chunks = documents("a.pdf", "b.pdf")
+    wrong_dimension = np.ones((2, DIMENSION + 1), dtype=np.float32)
+
+    with pytest.raises(Exception):
+        corpus.add_documents(docs, wrong_dimension, chunks)
+
+    assert corpus.stats() == before
+    assert corpus.full_text_map(["a.pdf", "b.pdf"]) == {"a.pdf": "a.pdf text"}
+
+
+def test_search_skips_removed_documents(corpus):
+    corpus.add_documents(*documents("b.pdf", "c.pdf"))
+    assert corpus.remove_document("b.pdf")
+
+    results = corpus.search(np.ones((1, DIMENSION), dtype=np.float32), k=3)
+    assert sorted(r["chunk"]["filename"] for r in results) == ["a.pdf", "c.pdf"]
+
+
+def test_hnsw_search_fetches_past_removed_vectors(tmp_path):
+    corpus = Corpus("hnsw", tmp_path / "hnsw", DIMENSION, "hnsw")
+    names = [f"{i}.pdf" for i in range(12)]
+    docs, _, chunks = documents(*names)
+    embeddings = np.tile(np.eye(1, DIMENSION, dtype=np.float32), (len(names), 1))
+    embeddings[:, 1] = np.linspace(1, 0, len(names))
+    corpus.add_documents(docs, embeddings, chunks)
+
+    # The best matches are removed but stay in the graph.
+    for name in names[:8]:
+        corpus.remove_document(name)
+
+    results = corpus.search(np.array([[1, 1, 0, 0]], dtype=np.float32), k=3)
+    assert [r["chunk"]["filename"] for r in results] == names[8:11]
+    assert corpus.stats()["vectors"] == len(names)
+    corpus.close()
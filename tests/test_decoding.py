@@ -0,0 +1,56 @@
+from src.modules.decoding import JSONScanner, extract_json
+
+KEYS = ["name", "skills"]
+
+
+def scan(text, keys=KEYS):
+    scanner = JSONScanner(keys)
+    scanner.feed(text)
+    return scanner
+
+
+def test_closes_once_every_key_is_present():
+    scanner = scan('{"name": "Ada", "skills": ["python"]}')
+    assert scanner.done
+    assert scanner.remaining == []
+
+
+def test_close_is_ignored_while_keys_are_missing():
+    scanner = scan('{"name": "Ada"}')
+    assert not scanner.done
+    assert scanner.remaining == ["skills"]
+
+    scanner.feed(', "skills": []}')
+    assert scanner.done
+
+
+def test_braces_inside_strings_do_not_close():
+    scanner = scan('{"name": "a } b", "skills": [{"note": "}]"}]')
+    assert not scanner.done
+    assert scanner.mode == "after_value"
+
+    scanner.feed("}")
+    assert scanner.done
+
+
+def test_key_only_counts_when_followed_by_colon():
+    scanner = scan('{"name" x, "skills": 1}')
+    assert not scanner.done
+    assert scanner.remaining == ["name"]
+
+
+def test_whitespace_before_colon_is_allowed():
+    scanner = scan('{"name"  :\n"Ada", "skills" : 1}')
+    assert scanner.done
+
+
+def test_extract_json_returns_first_balanced_value():
+    text = 'Sure: {"a": "}", "b": [1, {"c": 2}]} trailing {"d": 3}'
+    assert extract_json(text) == '{"a": "}", "b": [1, {"c": 2}]}'
+    assert extract_json('[1, [2]] {}') == "[1, [2]]"
+
+
+def test_extract_json_truncated_input():
+    assert extract_json('{"a": [1, 2') is None
+    assert extract_json('{"a": "unterminated }') is None
+    assert extract_json("no json here") is None
@@ -0,0 +1,25 @@
+import io
+import zipfile
+from src.modules.ingestion import ingestion_service
+
+
+def test_unsupported_members_are_skipped_unread(monkeypatch):
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w") as zip_ref:
+        zip_ref.writestr("resumes/", "")
+        zip_ref.writestr("resumes/ada.pdf", b"%PDF-1.4")
+        zip_ref.writestr("resumes/notes.txt", "not a resume")
+        zip_ref.writestr("__MACOSX/resumes/._ada.pdf", b"fork")
+        zip_ref.writestr("scan.PNG", b"png")
+    archive.seek(0)
+
+    read = []
+    original = ingestion_service._read_entry
+    monkeypatch.setattr(
+        ingestion_service, "_read_entry",
+        lambda zip_ref, info: read.append(info.filename) or original(zip_ref, info)
+    )
+
+    members = ingestion_service._read_members(archive)
+    assert [name for name, _ in members] == ["resumes/ada.pdf", "scan.PNG"]
+    assert read == ["resumes/ada.pdf", "scan.PNG"]
@@ -0,0 +1,29 @@
+import asyncio
+import pytest
+from fastapi import HTTPException
+from src.core.config import settings
+from src.modules.jobs import JobManager
+
+
+def test_rejects_with_429_when_queue_is_full(monkeypatch):
+    monkeypatch.setattr(settings, "JOB_WORKERS", 1)
+    monkeypatch.setattr(settings, "JOB_QUEUE_SIZE", 1)
+
+    async def scenario():
+        manager = JobManager()
+        release = asyncio.Event()
+
+        async def work(on_stage):
+            await release.wait()
+
+        jobs = [manager.submit(f"job-{i}", work) for i in range(2)]
+        with pytest.raises(HTTPException) as error:
+            manager.admit()
+        assert error.value.status_code == 429
+        assert error.value.headers["Retry-After"] == str(settings.JOB_RETRY_AFTER_SECONDS)
+
+        release.set()
+        await asyncio.gather(*(job["task"] for job in jobs))
+        manager.admit()
+
+    asyncio.run(scenario())